@@ -1,16 +1,21 @@
 import streamlit as st
+import os
 import random
-import json
+import secrets
 import time
-from datetime import datetime
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from typing import List, Dict, Tuple
-import base64
-import io
-from collections import Counter
-import re
+from typing import Dict
+
+from charts import (arc_figure, distribution_figure, latency_figure, mood_scores_figure, mood_timeline_figure,
+                    precompute_arc_figures)
+from metrics import METRICS
+from mood_scorer import document_mood
+from model_backend import backend_from_env
+from story_cache import cache_from_env
+from story_export import EXPORT_FORMATS, export_library, story_to_text
+from story_generator import EXPANSION_ENGINES, MoodToStoryGenerator, StoryRecord
+from story_jobs import GenerationJob, job_pool
+from story_store import StoryStore
+from text_stats import content_digest, file_stats, text_stats
 
 # Page configuration
 st.set_page_config(
@@ -80,179 +85,70 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-class MoodToStoryGenerator:
-    def __init__(self):
-        self.moods = {
-            "Joyful": {"emoji": "😊", "colors": ["#FFD93D", "#6BCF7F"], "genre": "Adventure/Comedy"},
-            "Melancholic": {"emoji": "😔", "colors": ["#95B8D1", "#6C5B7B"], "genre": "Drama/Reflective"},
-            "Mysterious": {"emoji": "🕵️", "colors": ["#2D3047", "#419D78"], "genre": "Mystery/Thriller"},
-            "Romantic": {"emoji": "❤️", "colors": ["#FF6B6B", "#FFA5A5"], "genre": "Romance/Drama"},
-            "Adventurous": {"emoji": "🏔️", "colors": ["#355070", "#6D597A"], "genre": "Action/Adventure"},
-            "Whimsical": {"emoji": "🌈", "colors": ["#9B5DE5", "#F15BB5"], "genre": "Fantasy/Fairy Tale"},
-            "Horror": {"emoji": "👻", "colors": ["#2D1B2E", "#8B1E3F"], "genre": "Horror/Suspense"},
-            "Nostalgic": {"emoji": "📻", "colors": ["#8F754F", "#D4B483"], "genre": "Historical/Memoir"}
-        }
-
-        self.story_elements = {
-            "characters": ["detective", "artist", "scientist", "traveler", "student", "warrior", "dreamer", "explorer"],
-            "settings": ["ancient forest", "futuristic city", "seaside village", "mountain monastery", "desert oasis",
-                         "underground library"],
-            "conflicts": ["lost treasure", "forbidden love", "ancient prophecy", "technological revolution",
-                          "family secret", "cosmic mystery"]
-        }
-
-        self.writing_styles = [
-            "Descriptive", "Dialogue-heavy", "Poetic", "Fast-paced", "Reflective", "Suspenseful"
-        ]
-
-    def analyze_mood_text(self, text: str) -> Dict:
-        """Analyze text input to detect mood"""
-        mood_keywords = {
-            "Joyful": ["happy", "excited", "wonderful", "amazing", "beautiful", "love", "fantastic"],
-            "Melancholic": ["sad", "lonely", "miss", "lost", "empty", "regret", "memory"],
-            "Mysterious": ["secret", "mystery", "unknown", "hidden", "curious", "strange"],
-            "Romantic": ["love", "heart", "romance", "passion", "kiss", "darling", "sweet"],
-            "Adventurous": ["adventure", "explore", "journey", "discover", "risk", "brave"],
-            "Whimsical": ["magic", "dream", "fantasy", "imagine", "wonder", "magical"],
-            "Horror": ["scary", "fear", "dark", "terror", "ghost", "haunted"],
-            "Nostalgic": ["remember", "past", "childhood", "old", "memory", "traditional"]
-        }
-
-        text_lower = text.lower()
-        mood_scores = {mood: 0 for mood in self.moods}
-
-        for mood, keywords in mood_keywords.items():
-            for keyword in keywords:
-                if keyword in text_lower:
-                    mood_scores[mood] += text_lower.count(keyword) * 2
-
-        # Detect emotional intensity
-        intensity_indicators = ["very", "extremely", "really", "so", "absolutely"]
-        intensity = 1
-        for indicator in intensity_indicators:
-            if indicator in text_lower:
-                intensity += 0.5
-
-        dominant_mood = max(mood_scores, key=mood_scores.get)
-        return {
-            "dominant_mood": dominant_mood if mood_scores[dominant_mood] > 0 else "Joyful",
-            "mood_scores": mood_scores,
-            "intensity": min(intensity, 3),
-            "word_count": len(text.split())
-        }
-
-    def generate_story(self, mood: str, user_input: str = "", style: str = "Descriptive",
-                       length: str = "Medium") -> Dict:
-        """Generate story based on mood and parameters"""
-
-        # Story templates based on mood
-        story_templates = {
-            "Joyful": [
-                "In a world filled with laughter, {character} discovered {element} that brought joy to everyone around.",
-                "The sun shone brightly as {character} embarked on a delightful journey to {setting}."
-            ],
-            "Melancholic": [
-                "As the rain fell softly, {character} remembered the days when {setting} was filled with life and laughter.",
-                "In the quiet emptiness of {setting}, {character} contemplated the meaning of {element}."
-            ],
-            "Mysterious": [
-                "When {character} found the ancient {element} in {setting}, little did they know it would unravel a centuries-old secret.",
-                "The mysterious events in {setting} led {character} on a quest to uncover the truth about {element}."
-            ],
-            "Romantic": [
-                "Under the starlit sky of {setting}, {character} found love in the most unexpected place while searching for {element}.",
-                "The story of {character}'s heart began in {setting}, where {element} brought two souls together."
-            ],
-            "Adventurous": [
-                "With courage in heart, {character} ventured into {setting} to discover the legendary {element}.",
-                "The perilous journey through {setting} tested {character}'s resolve to secure {element}."
-            ],
-            "Whimsical": [
-                "In a land where dreams came alive, {character} discovered that {setting} held the magical {element}.",
-                "Through the rainbow portal, {character} entered {setting} where {element} awaited with wonder."
-            ],
-            "Horror": [
-                "The shadows in {setting} whispered secrets that {character} wished they never uncovered about {element}.",
-                "When {character} found the cursed {element} in {setting}, the nightmare began."
-            ],
-            "Nostalgic": [
-                "Returning to {setting} after years, {character} rediscovered {element} that brought back cherished memories.",
-                "The old photograph led {character} back to {setting}, where the story of {element} unfolded."
-            ]
-        }
-
-        # Generate story elements
-        character = random.choice(self.story_elements["characters"])
-        setting = random.choice(self.story_elements["settings"])
-        conflict = random.choice(self.story_elements["conflicts"])
-
-        # Select template and generate story
-        template = random.choice(story_templates[mood])
-        story_seed = template.format(character=character, setting=setting, element=conflict)
-
-        # Expand based on length
-        length_words = {"Short": 100, "Medium": 300, "Long": 600}
-        target_words = length_words[length]
-
-        # Generate full story (simulated AI generation)
-        story = self._expand_story(story_seed, mood, style, target_words)
-
-        return {
-            "title": f"The {mood} {conflict.replace(' ', ' ')}",
-            "story": story,
-            "mood": mood,
-            "character": character,
-            "setting": setting,
-            "conflict": conflict,
-            "style": style,
-            "length": len(story.split()),
-            "emotional_arc": self._generate_emotional_arc(mood),
-            "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-
-    def _expand_story(self, seed: str, mood: str, style: str, target_words: int) -> str:
-        """Expand story seed to target length"""
-        # This would be replaced with actual AI model in production
-        story_expansions = {
-            "Joyful": "The air was filled with the scent of blooming flowers as birds sang cheerful melodies. Every step brought new discoveries and happy encounters with friendly creatures who shared their wisdom and laughter.",
-            "Melancholic": "The gentle breeze carried memories of times long past, each whisper echoing through the empty spaces where joy once resided. Time moved slowly, as if respecting the weight of the moments being remembered.",
-            "Mysterious": "Shadows danced in the corners, hiding secrets that begged to be uncovered. Every clue led to deeper questions, and the truth seemed to shift with each passing moment.",
-            "Romantic": "Hearts beat in synchrony as fate wove its invisible threads between souls destined to meet. Every glance held unspoken promises, and every touch sparked constellations of emotion.",
-            "Adventurous": "Danger lurked around every corner, but so did opportunity. The path ahead was uncertain, but the call of discovery was stronger than any fear that tried to hold back progress.",
-            "Whimsical": "Reality bent in delightful ways, where impossible things became ordinary and magic was as common as sunlight. The rules of physics took a holiday, allowing wonder to reign supreme.",
-            "Horror": "Silence screamed louder than any sound, and the darkness seemed to breathe with malicious intent. Every shadow held potential threats, and trust became a dangerous luxury.",
-            "Nostalgic": "The past reached through time with gentle hands, reminding of lessons learned and loves lost. Each memory was a treasure, carefully preserved in the museum of the heart."
-        }
-
-        base_story = seed + " " + story_expansions.get(mood, "")
-        words = base_story.split()
-
-        # Expand to target length
-        while len(words) < target_words:
-            expansion = " ".join(random.sample(words, min(10, len(words))))
-            words.extend(expansion.split())
-
-        return " ".join(words[:target_words])
-
-    def _generate_emotional_arc(self, mood: str) -> List[Dict]:
-        """Generate emotional arc for the story"""
-        arcs = {
-            "Joyful": [("Beginning", 0.7), ("Rising", 0.9), ("Climax", 1.0), ("Resolution", 0.8)],
-            "Melancholic": [("Beginning", 0.3), ("Rising", 0.5), ("Climax", 0.8), ("Resolution", 0.4)],
-            "Mysterious": [("Beginning", 0.4), ("Rising", 0.7), ("Climax", 0.9), ("Resolution", 0.6)],
-            "Romantic": [("Beginning", 0.6), ("Rising", 0.8), ("Climax", 0.95), ("Resolution", 0.85)],
-            "Adventurous": [("Beginning", 0.5), ("Rising", 0.8), ("Climax", 0.9), ("Resolution", 0.7)],
-            "Whimsical": [("Beginning", 0.8), ("Rising", 0.9), ("Climax", 0.95), ("Resolution", 0.85)],
-            "Horror": [("Beginning", 0.3), ("Rising", 0.6), ("Climax", 0.2), ("Resolution", 0.5)],
-            "Nostalgic": [("Beginning", 0.4), ("Rising", 0.7), ("Climax", 0.8), ("Resolution", 0.6)]
-        }
-
-        return [{"stage": stage, "intensity": intensity} for stage, intensity in arcs.get(mood, arcs["Joyful"])]
+@st.cache_resource
+def get_story_store() -> StoryStore:
+    """Open the story database; each browser's stories are kept apart by library_id()"""
+    return StoryStore()
+
+
+def library_id() -> str:
+    """Id of this browser's private story library
+
+    It lives in the page URL, so reloading or bookmarking the page keeps the
+    library while other visitors never see it.
+    """
+    if "library" not in st.query_params:
+        st.query_params["library"] = secrets.token_urlsafe(16)
+    return st.query_params["library"]
+
+
+@st.cache_resource
+def get_generator() -> MoodToStoryGenerator:
+    """Build the generator once per process and share it across sessions"""
+    precompute_arc_figures()
+    # Text caching is opt-in via STORY_CACHE_SIZE (and STORY_CACHE_PATH for the disk tier).
+    # A model server at STORY_MODEL_URL enables the "model" engine and model-backed enhancement
+    return MoodToStoryGenerator(cache=cache_from_env(), backend=backend_from_env())
+
+
+@st.cache_resource
+def get_analytics():
+    """Columnar history shared by every session and refreshed incrementally"""
+    # numpy-backed, so only imported once the analytics page is opened
+    from analytics import LibraryAnalytics
+    return LibraryAnalytics(get_story_store())
+
+
+@st.cache_resource
+def get_job_pool():
+    """Worker pool running story generation for every session"""
+    return job_pool()
+
+
+def session_rng() -> random.Random:
+    """Random source private to the current browser session
+
+    Sessions run their scripts on separate threads, so nothing here may draw
+    from the module-global random state.
+    """
+    if "rng" not in st.session_state:
+        st.session_state.rng = random.Random(random.SystemRandom().getrandbits(63))
+    return st.session_state.rng
+
+
+@st.cache_resource
+def start_metrics_server():
+    """Serve Prometheus metrics on STORY_METRICS_PORT, if set"""
+    port = os.environ.get("STORY_METRICS_PORT")
+    return METRICS.serve_prometheus(int(port)) if port else None
 
 
 def main():
     # Initialize generator
-    generator = MoodToStoryGenerator()
+    generator = get_generator()
+    start_metrics_server()
+    # Give a new browser its own library on the first page load
+    library_id()
 
     # Header
     st.markdown('<div class="main-header">📖 AI Mood-to-Story Generator</div>', unsafe_allow_html=True)
@@ -260,7 +156,8 @@ def main():
     # Sidebar
     st.sidebar.title("🎛️ Controls")
     app_mode = st.sidebar.radio("Select Mode",
-                                ["Mood Analysis", "Story Generation", "Story Library", "Writing Assistant"])
+                                ["Mood Analysis", "Story Generation", "Story Library", "Writing Assistant",
+                                 "Analytics"])
 
     # Main content
     if app_mode == "Mood Analysis":
@@ -271,6 +168,42 @@ def main():
         show_story_library(generator)
     elif app_mode == "Writing Assistant":
         show_writing_assistant(generator)
+    elif app_mode == "Analytics":
+        show_analytics(generator)
+
+    if st.sidebar.checkbox("Show metrics"):
+        show_metrics_panel()
+
+
+def show_metrics_panel():
+    st.sidebar.subheader("📊 Metrics")
+    snapshot = METRICS.snapshot()
+
+    rows = ["| Stage | Calls | Mean ms | Max ms |", "|---|---:|---:|---:|"]
+    for stage, timer in sorted(snapshot["timers"].items()):
+        mean_ms = timer["sum"] / timer["count"] * 1000
+        rows.append(f"| {stage} | {timer['count']} | {mean_ms:.1f} | {timer['max'] * 1000:.1f} |")
+    st.sidebar.markdown("\n".join(rows))
+    for event, count in sorted(snapshot["counters"].items()):
+        st.sidebar.caption(f"{event}: {count}")
+    cache = get_generator().cache
+    if cache is not None:
+        stats = cache.stats()
+        st.sidebar.caption(f"generation cache: {stats['entries']} entries in memory, "
+                           f"{stats['hit_rate']:.0%} hit rate")
+
+    metrics_path = os.environ.get("STORY_METRICS_PATH", "metrics.prom")
+    if st.sidebar.button("Write Prometheus file"):
+        METRICS.write_prometheus(metrics_path)
+        st.sidebar.success(f"Wrote {metrics_path}")
+
+
+# Word window for mood timelines when a document has no chapter headings
+TIMELINE_WINDOW_WORDS = 2000
+
+# Generation jobs: how long a click waits before handing off, and how often a pending job is polled
+JOB_GRACE_SECONDS = 0.1
+JOB_POLL_SECONDS = 0.25
 
 
 def show_mood_analysis(generator):
@@ -285,37 +218,46 @@ def show_mood_analysis(generator):
             placeholder="I'm feeling excited about the future and curious about what adventures await...",
             height=150
         )
+        document = st.file_uploader("...or upload a long document for a mood timeline", type=["txt", "md"])
+        if document is not None:
+            user_text = document.getvalue().decode("utf-8", errors="replace")
 
         if st.button("Analyze Mood", use_container_width=True):
             if user_text.strip():
-                with st.spinner("Analyzing your mood..."):
-                    time.sleep(2)
+                started = time.perf_counter()
+                # Long documents are scored once, section by section, and the totals come from the sections
+                timeline = None
+                if len(user_text.split()) > TIMELINE_WINDOW_WORDS:
+                    timeline = generator.analyze_mood_timeline(user_text, TIMELINE_WINDOW_WORDS)
+                    analysis = document_mood(timeline)
+                else:
                     analysis = generator.analyze_mood_text(user_text)
+                get_story_store().add_analysis(analysis, time.perf_counter() - started)
 
-                    # Display results
-                    mood_info = generator.moods[analysis["dominant_mood"]]
+                # Display results
+                mood_info = generator.moods[analysis["dominant_mood"]]
 
-                    st.markdown(f"""
-                    <div class="mood-card">
-                        <h2>{mood_info['emoji']} {analysis['dominant_mood']} Mood Detected</h2>
-                        <p>Genre: {mood_info['genre']}</p>
-                        <p>Intensity: {'⭐' * int(analysis['intensity'])}</p>
-                        <p>Word Count: {analysis['word_count']}</p>
-                    </div>
-                    """, unsafe_allow_html=True)
+                st.markdown(f"""
+                <div class="mood-card">
+                    <h2>{mood_info['emoji']} {analysis['dominant_mood']} Mood Detected</h2>
+                    <p>Genre: {mood_info['genre']}</p>
+                    <p>Intensity: {'⭐' * int(analysis['intensity'])}</p>
+                    <p>Word Count: {analysis['word_count']}</p>
+                </div>
+                """, unsafe_allow_html=True)
 
-                    # Mood scores visualization
-                    scores_df = pd.DataFrame({
-                        'Mood': list(analysis['mood_scores'].keys()),
-                        'Score': list(analysis['mood_scores'].values())
-                    })
-                    scores_df = scores_df[scores_df['Score'] > 0]
-
-                    if not scores_df.empty:
-                        fig = px.bar(scores_df, x='Mood', y='Score',
-                                     title="Mood Analysis Scores",
-                                     color='Score', color_continuous_scale='Viridis')
+                # Mood scores visualization
+                if any(analysis['mood_scores'].values()):
+                    with METRICS.timer("chart_build"):
+                        fig = mood_scores_figure(analysis['mood_scores'])
                         st.plotly_chart(fig, use_container_width=True)
+
+                # Long documents also get their per-section timeline, scored in parallel
+                if timeline is not None:
+                    st.subheader("📖 Mood Timeline")
+                    with METRICS.timer("chart_build"):
+                        st.plotly_chart(mood_timeline_figure(timeline, list(generator.moods)),
+                                        use_container_width=True)
             else:
                 st.warning("Please enter some text to analyze your mood.")
 
@@ -349,7 +291,9 @@ def show_story_generation(generator):
         writing_style = st.selectbox("Writing Style", generator.writing_styles)
 
         # Story length
-        story_length = st.radio("Story Length", ["Short", "Medium", "Long"])
+        story_length = st.radio("Story Length", ["Short", "Medium", "Long", "Custom"])
+        if story_length == "Custom":
+            story_length = int(st.number_input("Words", min_value=50, max_value=100000, value=1500, step=50))
 
         # Additional inputs
         custom_character = st.text_input("Custom Character (optional)")
@@ -360,80 +304,177 @@ def show_story_generation(generator):
             emotional_arc = st.slider("Emotional Intensity", 1, 10, 7)
             include_twist = st.checkbox("Include Plot Twist")
             target_audience = st.selectbox("Target Audience", ["Children", "Young Adult", "Adult", "All Ages"])
+            engines = [engine for engine in EXPANSION_ENGINES if engine != "model" or generator.backend]
+            expansion_engine = st.selectbox("Expansion Engine", engines, format_func=lambda x: x.capitalize())
 
     with col2:
         st.subheader("Generate Your Story")
 
         if st.button("🎭 Generate Story", use_container_width=True):
-            with st.spinner("Crafting your unique story..."):
-                time.sleep(3)
-
-                # Generate story
-                story_data = generator.generate_story(
-                    mood=selected_mood,
-                    style=writing_style,
-                    length=story_length
-                )
-
-                # Store story in session state
-                if 'stories' not in st.session_state:
-                    st.session_state.stories = []
-                st.session_state.stories.append(story_data)
+            # Plan here, write on the shared job pool; this script run does not wait for the text
+            story_data, chunks = generator.generate_story_stream(
+                mood=selected_mood,
+                style=writing_style,
+                length=story_length,
+                seed=session_rng().getrandbits(63),
+                engine=expansion_engine
+            )
+            job = GenerationJob(story_data, chunks, get_job_pool())
+            st.session_state.story_job = job
+            # Short stories usually finish within this grace period and show without polling
+            job.wait(JOB_GRACE_SECONDS)
+
+        error = st.session_state.pop("story_error", None)
+        if error:
+            st.error(error)
+
+        job = st.session_state.get("story_job")
+        if job is not None:
+            pending = not job.done()
+            # Only this fragment reruns while the job is pending, and only on a timer
+            st.fragment(run_every=JOB_POLL_SECONDS if pending else None)(show_story_job)(generator, job, pending)
+
+
+def show_story_job(generator, job: GenerationJob, was_pending: bool):
+    story_data = job.story_data
+    mood_info = generator.moods[story_data['mood']]
+
+    st.markdown(f"""
+    <div class="story-card">
+        <h2 style="color: {mood_info['colors'][0]};">{story_data['title']}</h2>
+        <p><strong>Mood:</strong> {mood_info['emoji']} {story_data['mood']}</p>
+        <p><strong>Style:</strong> {story_data['style']}</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    if not job.done():
+        st.write(job.text)
+        st.caption("✍️ Writing...")
+        return
 
-                # Display story
-                mood_info = generator.moods[selected_mood]
+    try:
+        story_data = job.result()
+    except Exception as error:
+        # Forget the failed job so the error shows once instead of on every visit to the page
+        st.session_state.pop("story_job", None)
+        message = f"Story generation failed: {error}"
+        if was_pending:
+            # The fragment is polling; rerun the page to stop it and show the error there
+            st.session_state.story_error = message
+            st.rerun()
+        st.error(message)
+        return
+    st.write(story_data['story'])
+    st.caption(f"Length: {story_data['length']} words")
 
-                st.markdown(f"""
-                <div class="story-card">
-                    <h2 style="color: {mood_info['colors'][0]};">{story_data['title']}</h2>
-                    <p><strong>Mood:</strong> {mood_info['emoji']} {selected_mood}</p>
-                    <p><strong>Style:</strong> {writing_style}</p>
-                    <p><strong>Length:</strong> {story_data['length']} words</p>
-                    <hr>
-                    {story_data['story']}
-                </div>
-                """, unsafe_allow_html=True)
+    if not job.saved:
+        # Store story in the persistent library
+        get_story_store().add(StoryRecord(**story_data['recipe']), story_data['story'], job.seconds, library_id())
+        METRICS.incr("stories_generated")
+        job.saved = True
+        if was_pending:
+            # Rerun the page once so the fragment stops polling
+            st.rerun()
 
-                # Emotional arc visualization
-                st.subheader("📈 Emotional Arc")
-                arc_df = pd.DataFrame(story_data['emotional_arc'])
-                fig = px.line(arc_df, x='stage', y='intensity',
-                              title="Story Emotional Journey",
-                              markers=True, line_shape='spline')
-                st.plotly_chart(fig, use_container_width=True)
+    # Emotional arc visualization
+    st.subheader("📈 Emotional Arc")
+    with METRICS.timer("chart_build"):
+        st.plotly_chart(arc_figure(story_data['mood']), use_container_width=True)
 
 
 def show_story_library(generator):
     st.header("📚 Story Library")
 
-    if 'stories' not in st.session_state or not st.session_state.stories:
+    store = get_story_store()
+    library = library_id()
+    if not store.count(owner=library):
         st.info("No stories generated yet. Go to 'Story Generation' to create your first story!")
         return
 
-    # Display all generated stories
-    for i, story in enumerate(reversed(st.session_state.stories)):
-        with st.expander(f"{i + 1}. {story['title']} - {story['generated_at']}"):
-            col1, col2 = st.columns([3, 1])
-
-            with col1:
-                st.write(story['story'])
-
-            with col2:
-                mood_info = generator.moods[story['mood']]
-                st.markdown(f"""
-                <div style="background: linear-gradient(135deg, {mood_info['colors'][0]}, {mood_info['colors'][1]});
-                            padding: 1rem; border-radius: 10px; color: white;">
-                    <p><strong>Mood:</strong> {story['mood']}</p>
-                    <p><strong>Style:</strong> {story['style']}</p>
-                    <p><strong>Words:</strong> {story['length']}</p>
-                    <p><strong>Character:</strong> {story['character']}</p>
-                    <p><strong>Setting:</strong> {story['setting']}</p>
-                </div>
-                """, unsafe_allow_html=True)
-
-                # Export options
-                if st.button(f"Export Story {i + 1}", key=f"export_{i}"):
-                    create_download_link(story, f"story_{i + 1}.txt")
+    # Index stories saved without their text (a single cheap query once they all are)
+    with st.spinner("Indexing library..."):
+        store.index_missing(lambda record: generator.render_story(record)["story"])
+
+    # Search, facets and pagination are applied in SQL, so only one page of matches is ever loaded
+    search_query = st.text_input("🔍 Search stories", placeholder="Words from the story, a character, a setting...")
+    facet_options = {
+        "mood": list(generator.moods.keys()),
+        "style": generator.writing_styles,
+        "character": generator.story_elements["characters"],
+        "setting": generator.story_elements["settings"],
+        "conflict": generator.story_elements["conflicts"]
+    }
+    selected = {facet: st.session_state.get(f"facet_{facet}", "All") for facet in facet_options}
+    facets = {facet: value for facet, value in selected.items() if value != "All"}
+    counts = store.facet_counts(search_query, owner=library, **facets)
+
+    for column, (facet, values) in zip(st.columns(len(facet_options)), facet_options.items()):
+        facet_counts = counts[facet]
+        options = ["All"] + [value for value in values if facet_counts.get(value) or value == selected[facet]]
+        with column:
+            st.selectbox(facet.capitalize(), options, key=f"facet_{facet}",
+                         format_func=lambda x, c=facet_counts: x if x == "All" else f"{x} ({c.get(x, 0)})")
+
+    page_size = 20
+    total = store.count(search_query, owner=library, **facets)
+    page_count = max(1, -(-total // page_size))
+    page_col, caption_col = st.columns([1, 4])
+    with page_col:
+        page = st.number_input("Page", min_value=1, max_value=page_count, value=1) - 1
+    with caption_col:
+        st.caption(f"{total} stories · page {page + 1} of {page_count}")
+
+    # Bulk export of the filtered library, written story by story to a spooled temporary file.
+    # It has no name on disk, so a session that ends without downloading leaves nothing behind
+    with st.expander("📦 Export Library"):
+        export_format = st.radio("Format", list(EXPORT_FORMATS.keys()), horizontal=True)
+        if st.button(f"Prepare export of {total} stories"):
+            previous = st.session_state.pop("export_file", None)
+            if previous is not None:
+                previous.close()
+            with st.spinner("Building export..."):
+                export_file, _ = export_library(store, generator, export_format, search_query, owner=library,
+                                                **facets)
+            st.session_state.export_file = export_file
+            st.session_state.export_format = export_format
+
+        export_file = st.session_state.get("export_file")
+        if export_file is not None:
+            suffix, mime = EXPORT_FORMATS[st.session_state.export_format]
+            export_file.seek(0)
+            st.download_button("Download Export", export_file.read(), file_name=f"stories{suffix}", mime=mime,
+                               on_click="ignore")
+
+    # Display the current page of stories
+    with METRICS.timer("library_render"):
+        for story_id, record in store.list_page(page, page_size, search_query, owner=library, **facets):
+            story = generator.describe_story(record)
+            with st.expander(f"{story_id}. {story['title']} - {story['generated_at']}"):
+                col1, col2 = st.columns([3, 1])
+
+                with col1:
+                    # Story text is only regenerated from its recipe once an entry is opened
+                    if st.toggle("Show story", key=f"open_{story_id}"):
+                        full_story = generator.render_story(record)
+                        st.write(full_story['story'])
+
+                        # Export options
+                        st.download_button(f"Export Story {story_id}", story_to_text(full_story),
+                                           file_name=f"story_{story_id}.txt", key=f"export_{story_id}",
+                                           on_click="ignore")
+
+                with col2:
+                    mood_info = generator.moods[story['mood']]
+                    st.markdown(f"""
+                    <div style="background: linear-gradient(135deg, {mood_info['colors'][0]}, {mood_info['colors'][1]});
+                                padding: 1rem; border-radius: 10px; color: white;">
+                        <p><strong>Mood:</strong> {story['mood']}</p>
+                        <p><strong>Style:</strong> {story['style']}</p>
+                        <p><strong>Words:</strong> {story['length']}</p>
+                        <p><strong>Character:</strong> {story['character']}</p>
+                        <p><strong>Setting:</strong> {story['setting']}</p>
+                    </div>
+                    """, unsafe_allow_html=True)
 
 
 def show_writing_assistant(generator):
@@ -447,11 +488,14 @@ def show_writing_assistant(generator):
 
         if st.button("Enhance Story"):
             if story_to_enhance:
-                with st.spinner("Enhancing your story..."):
-                    time.sleep(2)
-                    # Simulate enhancement
-                    enhanced_story = story_to_enhance + "\n\n[Enhanced with richer descriptions and emotional depth]"
-                    st.text_area("Enhanced Story", enhanced_story, height=200)
+                # Tokens are shown as they arrive, then swapped for an editable copy
+                placeholder = st.empty()
+                try:
+                    enhanced_story = placeholder.write_stream(generator.enhance_story_stream(story_to_enhance))
+                except Exception as error:
+                    placeholder.error(f"Story enhancement failed: {error}")
+                else:
+                    placeholder.text_area("Enhanced Story", enhanced_story, height=200)
             else:
                 st.warning("Please enter a story to enhance")
 
@@ -460,27 +504,105 @@ def show_writing_assistant(generator):
         selected_mood = st.selectbox("Prompt Mood", list(generator.moods.keys()))
 
         if st.button("Generate Writing Prompt"):
-            prompt = f"Write a {selected_mood.lower()} story about a {random.choice(generator.story_elements['characters'])} " \
-                     f"in {random.choice(generator.story_elements['settings'])} " \
-                     f"who discovers {random.choice(generator.story_elements['conflicts'])}."
+            prompt = generator.writing_prompt(selected_mood, session_rng())
 
             st.info(f"**Prompt:** {prompt}")
 
         st.subheader("Word Count Analysis")
         text_to_analyze = st.text_area("Text to analyze:", height=100)
-        if text_to_analyze:
-            words = len(text_to_analyze.split())
-            sentences = len(re.findall(r'[.!?]+', text_to_analyze))
-            st.metric("Word Count", words)
-            st.metric("Sentences", sentences)
-
-
-def create_download_link(story_data, filename):
-    """Create download link for story"""
-    story_text = f"Title: {story_data['title']}\n\n{story_data['story']}\n\nGenerated: {story_data['generated_at']}"
-    b64 = base64.b64encode(story_text.encode()).decode()
-    href = f'<a href="data:file/txt;base64,{b64}" download="{filename}">Download Story</a>'
-    st.markdown(href, unsafe_allow_html=True)
+        manuscript = st.file_uploader("...or upload a manuscript", type=["txt", "md"])
+
+        # Statistics are cached by content hash, so unchanged text is never recounted
+        stats = None
+        if manuscript is not None:
+            stats = manuscript_stats(content_digest(manuscript.getvalue()), manuscript)
+        elif text_to_analyze:
+            stats = pasted_text_stats(content_digest(text_to_analyze.encode()), text_to_analyze)
+
+        if stats:
+            stat_col1, stat_col2, stat_col3 = st.columns(3)
+            stat_col1.metric("Word Count", f"{stats['words']:,}")
+            stat_col2.metric("Sentences", f"{stats['sentences']:,}")
+            stat_col3.metric("Paragraphs", f"{stats['paragraphs']:,}")
+            stat_col1.metric("Reading Ease", stats['flesch_reading_ease'])
+            stat_col2.metric("Grade Level", stats['flesch_kincaid_grade'])
+            stat_col3.metric("Reading Time", f"{stats['reading_minutes']:,} min")
+
+
+@st.cache_data(max_entries=64, show_spinner="Counting...")
+def manuscript_stats(digest: str, _manuscript) -> Dict:
+    """Stream an uploaded manuscript through the statistics engine, cached by digest"""
+    _manuscript.seek(0)
+    with METRICS.timer("text_stats"):
+        return file_stats(_manuscript)
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def pasted_text_stats(digest: str, _text: str) -> Dict:
+    """Statistics for pasted text, cached by digest"""
+    with METRICS.timer("text_stats"):
+        return text_stats(_text)
+
+
+ANALYTICS_PERIODS = {"All time": None, "Last 30 days": 30 * 86400, "Last 7 days": 7 * 86400,
+                     "Last 24 hours": 86400}
+
+
+def show_analytics(generator):
+    st.header("📊 Analytics")
+
+    analytics = get_analytics()
+    # Only rows added since the last view are read; aggregates are vectorized over the columns
+    with METRICS.timer("analytics_refresh"):
+        analytics.refresh()
+    if not analytics.stories.size and not analytics.analyses.size:
+        st.info("Nothing to chart yet. Generate stories or analyze moods first!")
+        return
+
+    period = st.radio("Period", list(ANALYTICS_PERIODS), horizontal=True)
+    since = time.time() - ANALYTICS_PERIODS[period] if ANALYTICS_PERIODS[period] else None
+    with METRICS.timer("analytics_aggregate"):
+        distributions = analytics.story_distributions(since)
+        latency = analytics.latency_over_time(since)
+        summary = analytics.analysis_summary(since)
+
+    story_count = sum(distributions["mood"].values())
+    timed_count = int(latency["count"].sum())
+    metric_col1, metric_col2, metric_col3 = st.columns(3)
+    metric_col1.metric("Stories", f"{story_count:,}")
+    metric_col2.metric("Mood Analyses", f"{summary['count']:,}")
+    metric_col3.metric("Mean Generation Time",
+                       f"{(latency['mean'] * latency['count']).sum() / timed_count * 1000:,.1f} ms"
+                       if timed_count else "–")
+
+    if story_count:
+        st.subheader("📚 Stories")
+        # Known moods and styles keep their usual order
+        distributions["mood"] = {mood: distributions["mood"].get(mood, 0) for mood in generator.moods}
+        distributions["style"] = {style: distributions["style"].get(style, 0) for style in generator.writing_styles}
+        charts = [("mood", "By Mood"), ("style", "By Style"), ("length", "By Length (words)"),
+                  ("character", "By Character"), ("setting", "By Setting"), ("engine", "By Engine")]
+        with METRICS.timer("chart_build"):
+            for row in range(0, len(charts), 2):
+                for column, (name, title) in zip(st.columns(2), charts[row:row + 2]):
+                    with column:
+                        st.plotly_chart(distribution_figure(distributions[name], title), use_container_width=True)
+            if timed_count:
+                st.plotly_chart(latency_figure(latency), use_container_width=True)
+
+    if summary["count"]:
+        st.subheader("😊 Mood Analyses")
+        analysis_col1, analysis_col2 = st.columns([2, 1])
+        with analysis_col1:
+            moods = {mood: summary["moods"].get(mood, 0) for mood in generator.moods}
+            with METRICS.timer("chart_build"):
+                st.plotly_chart(distribution_figure(moods, "Detected Moods"), use_container_width=True)
+        with analysis_col2:
+            st.metric("Mean Words Analyzed", f"{summary['mean_words']:,.0f}")
+            st.metric("Mean Analysis Time", f"{summary['mean_seconds'] * 1000:.1f} ms")
+            st.markdown("\n".join(["| Mood | Mean intensity |", "| --- | --- |"]
+                                  + [f"| {mood} | {intensity:.2f} |"
+                                     for mood, intensity in summary["mean_intensity"].items()]))
 
 
 # Future enhancements section
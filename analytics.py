@@ -0,0 +1,155 @@
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from story_generator import STORY_ELEMENTS
+from story_store import ANALYSIS_HISTORY_COLUMNS, STORY_HISTORY_COLUMNS, StoryStore
+
+# Story length buckets (upper bounds in words), matching the Short/Medium/Long presets
+LENGTH_BUCKETS = (100, 300, 600, 1500, 5000, 20000, 100000)
+
+# Column kinds: "int" and "float" are stored as is, "category" as integer codes into a label list
+STORY_COLUMN_KINDS = {
+    "id": "int", "created_at": "float", "mood": "category", "style": "category", "target_words": "int",
+    "character_index": "int", "setting_index": "int", "engine": "category", "generation_seconds": "float"
+}
+ANALYSIS_COLUMN_KINDS = {
+    "id": "int", "created_at": "float", "dominant_mood": "category", "intensity": "float", "word_count": "int",
+    "seconds": "float"
+}
+
+
+class ColumnTable:
+    """Append-only table held as one numpy array per column
+
+    Arrays grow by doubling, so appending a batch of rows is amortized
+    O(batch) and every aggregate is a vectorized pass over whole columns.
+    """
+
+    def __init__(self, kinds: Dict[str, str]):
+        self.kinds = kinds
+        self.size = 0
+        self.categories: Dict[str, List[str]] = {name: [] for name, kind in kinds.items() if kind == "category"}
+        self._codes: Dict[str, Dict[str, int]] = {name: {} for name in self.categories}
+        self._arrays = {name: np.empty(0, dtype=np.float64 if kind == "float" else np.int64)
+                        for name, kind in kinds.items()}
+
+    def append_rows(self, rows: Sequence[Tuple]):
+        """Append rows whose values follow the column order of kinds"""
+        if not rows:
+            return
+        end = self.size + len(rows)
+        if end > len(self._arrays["id"]):
+            capacity = max(end, 2 * len(self._arrays["id"]), 1024)
+            for name, array in self._arrays.items():
+                grown = np.empty(capacity, dtype=array.dtype)
+                grown[:self.size] = array[:self.size]
+                self._arrays[name] = grown
+
+        for name, values in zip(self.kinds, zip(*rows)):
+            kind = self.kinds[name]
+            if kind == "category":
+                codes, labels = self._codes[name], self.categories[name]
+                for value in set(values):
+                    if value not in codes:
+                        codes[value] = len(labels)
+                        labels.append(value)
+                values = [codes[value] for value in values]
+            elif kind == "float":
+                values = [np.nan if value is None else value for value in values]
+            self._arrays[name][self.size:end] = values
+        self.size = end
+
+    def column(self, name: str) -> np.ndarray:
+        return self._arrays[name][:self.size]
+
+
+def counts_by(codes: np.ndarray, labels: Sequence[str], mask: Optional[np.ndarray] = None) -> Dict[str, int]:
+    """Count rows per label of an integer-coded column, optionally only where mask is true"""
+    if mask is not None:
+        codes = codes[mask]
+    counts = np.bincount(codes, minlength=len(labels))
+    return {label: int(count) for label, count in zip(labels, counts)}
+
+
+class LibraryAnalytics:
+    """Columnar copy of the story and analysis history, refreshed incrementally
+
+    refresh() reads only rows added since the previous call, so keeping the
+    tables current costs time in proportion to new activity, not history size.
+    """
+
+    def __init__(self, store: StoryStore):
+        self.store = store
+        self.stories = ColumnTable({name: STORY_COLUMN_KINDS[name] for name in STORY_HISTORY_COLUMNS})
+        self.analyses = ColumnTable({name: ANALYSIS_COLUMN_KINDS[name] for name in ANALYSIS_HISTORY_COLUMNS})
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        with self._lock:
+            last_story = int(self.stories.column("id")[-1]) if self.stories.size else 0
+            last_analysis = int(self.analyses.column("id")[-1]) if self.analyses.size else 0
+            self.stories.append_rows(self.store.story_history(last_story))
+            self.analyses.append_rows(self.store.analysis_history(last_analysis))
+
+    def story_mask(self, since: Optional[float] = None) -> np.ndarray:
+        return self.stories.column("created_at") >= (since or 0)
+
+    def story_distributions(self, since: Optional[float] = None) -> Dict[str, Dict[str, int]]:
+        """Story counts by mood, style, engine, character, setting and length bucket"""
+        table = self.stories
+        mask = self.story_mask(since)
+        distributions = {name: counts_by(table.column(name), table.categories[name], mask)
+                         for name in ("mood", "style", "engine")}
+        distributions["character"] = counts_by(table.column("character_index"), STORY_ELEMENTS["characters"], mask)
+        distributions["setting"] = counts_by(table.column("setting_index"), STORY_ELEMENTS["settings"], mask)
+
+        buckets = np.searchsorted(LENGTH_BUCKETS, table.column("target_words")[mask])
+        labels = [f"≤{bound:,}" for bound in LENGTH_BUCKETS] + [f">{LENGTH_BUCKETS[-1]:,}"]
+        distributions["length"] = counts_by(buckets, labels)
+        return distributions
+
+    def latency_over_time(self, since: Optional[float] = None, bins: int = 40) -> Dict[str, np.ndarray]:
+        """Generation count, mean and p95 seconds per time bin, for stories with a recorded time"""
+        seconds = self.stories.column("generation_seconds")
+        mask = self.story_mask(since) & ~np.isnan(seconds)
+        times, seconds = self.stories.column("created_at")[mask], seconds[mask]
+        if not len(times):
+            return {"start": np.empty(0), "count": np.empty(0), "mean": np.empty(0), "p95": np.empty(0)}
+
+        start, width = times.min(), max(np.ptp(times) / bins, 1.0)
+        bin_index = np.minimum(((times - start) // width).astype(np.int64), bins - 1)
+        count = np.bincount(bin_index, minlength=bins)
+        total = np.bincount(bin_index, weights=seconds, minlength=bins)
+
+        # p95 per bin: sort by (bin, seconds) once, then pick each bin's 95th-percentile position
+        order = np.lexsort((seconds, bin_index))
+        bin_starts = np.concatenate(([0], np.cumsum(count)[:-1]))
+        positions = bin_starts + np.floor(0.95 * np.maximum(count - 1, 0)).astype(np.int64)
+        p95 = seconds[order][np.minimum(positions, len(seconds) - 1)]
+
+        filled = count > 0
+        return {
+            "start": (start + width * np.arange(bins))[filled],
+            "count": count[filled],
+            "mean": total[filled] / count[filled],
+            "p95": p95[filled]
+        }
+
+    def analysis_summary(self, since: Optional[float] = None) -> Dict:
+        """Analysis counts and mean intensity per detected mood, plus totals"""
+        table = self.analyses
+        mask = table.column("created_at") >= (since or 0)
+        codes, labels = table.column("dominant_mood")[mask], table.categories["dominant_mood"]
+        counts = np.bincount(codes, minlength=len(labels))
+        intensity = np.bincount(codes, weights=table.column("intensity")[mask], minlength=len(labels))
+        seconds = table.column("seconds")[mask]
+        return {
+            "count": int(mask.sum()),
+            "moods": {label: int(count) for label, count in zip(labels, counts)},
+            "mean_intensity": {label: float(total / count) for label, total, count in zip(labels, intensity, counts)
+                               if count},
+            "mean_words": float(table.column("word_count")[mask].mean()) if mask.any() else 0.0,
+            "mean_seconds": float(np.nanmean(seconds)) if (~np.isnan(seconds)).any() else 0.0
+        }
@@ -0,0 +1,158 @@
+"""Benchmarks for the generator hot paths
+
+Reports ops/sec, p50/p99 latency and peak memory per case, optionally saves
+the results as a JSON baseline and fails when a case regresses past the
+threshold against a saved baseline.
+
+    python benchmark.py --save baseline.json
+    python benchmark.py --compare baseline.json --threshold 0.25
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+import ngram_engine
+from story_generator import LENGTH_WORDS, MoodToStoryGenerator, STORY_EXPANSIONS
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Story_app.py")
+
+
+def sample_text(size_bytes: int) -> str:
+    """Deterministic mood-laden text of roughly size_bytes"""
+    words = " ".join(STORY_EXPANSIONS.values()).split()
+    rng = random.Random(0)
+    parts, total = [], 0
+    while total < size_bytes:
+        word = rng.choice(words)
+        parts.append(word)
+        total += len(word) + 1
+    return " ".join(parts)
+
+
+def build_cases(include_app: bool = True) -> List[Tuple[str, Callable[[], None]]]:
+    """Name and zero-argument callable for every benchmark case"""
+    generator = MoodToStoryGenerator()
+    cases = []
+
+    for label, size in [("10w", 60), ("1kB", 1_000), ("100kB", 100_000), ("1MB", 1_000_000)]:
+        text = sample_text(size)
+        cases.append((f"analyze_mood_text[{label}]", lambda text=text: generator.analyze_mood_text(text)))
+
+    seeds = iter(range(10 ** 9))
+    for length in list(LENGTH_WORDS) + [5_000, 20_000]:
+        cases.append((f"generate_story[{length}]",
+                      lambda length=length: generator.generate_story("Mysterious", length=length, seed=next(seeds))))
+
+    story_seed = "When the detective found the ancient lost treasure in the underground library."
+    rng = random.Random(0)
+    for target_words in [600, 20_000]:
+        cases.append((f"_expand_story[{target_words}]",
+                      lambda target_words=target_words: generator._expand_story(
+                          story_seed, "Mysterious", "Descriptive", target_words, rng)))
+        cases.append((f"ngram_expand[{target_words}]",
+                      lambda target_words=target_words: "".join(ngram_engine.expand_stream(
+                          story_seed, "Mysterious", target_words, rng.getrandbits(63)))))
+
+    cases.append(("_generate_emotional_arc", lambda: generator._generate_emotional_arc("Horror")))
+
+    if include_app:
+        cases.extend(app_cases())
+    return cases
+
+
+def app_cases() -> List[Tuple[str, Callable[[], None]]]:
+    """End-to-end reruns of each page through Streamlit's AppTest"""
+    from streamlit.testing.v1 import AppTest
+
+    os.environ.setdefault("STORY_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench.db"))
+    cases = []
+    for mode in ["Mood Analysis", "Story Generation", "Story Library", "Writing Assistant", "Analytics"]:
+        app = AppTest.from_file(APP_PATH, default_timeout=60).run()
+        app.sidebar.radio[0].set_value(mode).run()
+        cases.append((f"app_rerun[{mode}]", app.run))
+    return cases
+
+
+def measure(func: Callable[[], None], min_time: float, max_runs: int) -> Dict:
+    """Time repeated calls, then measure peak memory of a single call"""
+    func()  # warm-up
+
+    timings = []
+    deadline = time.perf_counter() + min_time
+    while len(timings) < max_runs and (len(timings) < 5 or time.perf_counter() < deadline):
+        start = time.perf_counter_ns()
+        func()
+        timings.append(time.perf_counter_ns() - start)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    mean_ns = statistics.fmean(timings)
+    return {
+        "runs": len(timings),
+        "ops_per_sec": 1e9 / mean_ns if mean_ns else float("inf"),
+        "p50_ms": timings[len(timings) // 2] / 1e6,
+        "p99_ms": timings[min(len(timings) - 1, int(len(timings) * 0.99))] / 1e6,
+        "peak_memory_kb": peak / 1024
+    }
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    """Cases whose p50 latency or peak memory grew by more than threshold"""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric in ["p50_ms", "peak_memory_kb"]:
+            if previous[metric] > 0 and result[metric] > previous[metric] * (1 + threshold):
+                change = result[metric] / previous[metric] - 1
+                regressions.append(f"{name}: {metric} {previous[metric]:.3f} -> {result[metric]:.3f} (+{change:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this text")
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds to spend timing each case")
+    parser.add_argument("--max-runs", type=int, default=10_000)
+    parser.add_argument("--no-app", action="store_true", help="skip the AppTest page reruns")
+    parser.add_argument("--save", metavar="PATH", help="write results to a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="fail on regressions against a JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative slowdown (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'case':36} {'ops/sec':>12} {'p50 ms':>10} {'p99 ms':>10} {'peak kB':>10}")
+    for name, func in build_cases(include_app=not args.no_app):
+        if args.filter not in name:
+            continue
+        result = results[name] = measure(func, args.min_time, args.max_runs)
+        print(f"{name:36} {result['ops_per_sec']:12.1f} {result['p50_ms']:10.3f} "
+              f"{result['p99_ms']:10.3f} {result['peak_memory_kb']:10.1f}")
+
+    if args.save:
+        with open(args.save, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+        print(f"Saved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+from functools import lru_cache
+from typing import Dict, List
+
+import plotly.graph_objects as go
+
+from story_generator import EMOTIONAL_ARCS
+
+# An empty template keeps the serialized figure small; Streamlit applies its own theme
+SLIM_TEMPLATE = go.layout.Template()
+
+
+@lru_cache(maxsize=None)
+def arc_figure(mood: str) -> go.Figure:
+    """Emotional arc line chart for a mood, built once per process
+
+    The figure is shared between sessions, so callers must not modify it.
+    """
+    stages, intensities = zip(*EMOTIONAL_ARCS.get(mood, EMOTIONAL_ARCS["Joyful"]))
+    return go.Figure(
+        go.Scatter(x=stages, y=intensities, mode="lines+markers", line_shape="spline"),
+        layout=dict(title="Story Emotional Journey", template=SLIM_TEMPLATE,
+                    xaxis_title="stage", yaxis_title="intensity")
+    )
+
+
+def precompute_arc_figures():
+    """Build the arc figure for every mood up front"""
+    for mood in EMOTIONAL_ARCS:
+        arc_figure(mood)
+
+
+def mood_scores_figure(mood_scores: Dict[str, int]) -> go.Figure:
+    """Bar chart of the non-zero mood scores, built straight from the score dict"""
+    moods = [mood for mood, score in mood_scores.items() if score > 0]
+    scores = [mood_scores[mood] for mood in moods]
+    return go.Figure(
+        go.Bar(x=moods, y=scores, marker=dict(color=scores, colorscale="Viridis", showscale=True)),
+        layout=dict(title="Mood Analysis Scores", template=SLIM_TEMPLATE,
+                    xaxis_title="Mood", yaxis_title="Score")
+    )
+
+
+def mood_timeline_figure(timeline: List[Dict], moods: List[str]) -> go.Figure:
+    """Heatmap of mood scores per document section"""
+    sections = [entry["section"] for entry in timeline]
+    scores = [[entry["mood_scores"][mood] for entry in timeline] for mood in moods]
+    return go.Figure(
+        go.Heatmap(x=sections, y=moods, z=scores, colorscale="Viridis"),
+        layout=dict(title="Mood Across the Document", template=SLIM_TEMPLATE, xaxis_title="Section")
+    )
+
+
+def distribution_figure(counts: Dict[str, int], title: str) -> go.Figure:
+    """Bar chart of a label -> count distribution, zero counts dropped"""
+    labels = [label for label, count in counts.items() if count]
+    return go.Figure(
+        go.Bar(x=labels, y=[counts[label] for label in labels]),
+        layout=dict(title=title, template=SLIM_TEMPLATE, yaxis_title="Count", margin=dict(t=40, b=0))
+    )
+
+
+def latency_figure(latency: Dict) -> go.Figure:
+    """Mean and p95 generation time per time bin, from LibraryAnalytics.latency_over_time"""
+    # Epoch seconds to datetimes without leaving numpy
+    times = (latency["start"] * 1000).astype("datetime64[ms]")
+    return go.Figure(
+        [go.Scatter(x=times, y=latency["mean"], mode="lines+markers", name="mean"),
+         go.Scatter(x=times, y=latency["p95"], mode="lines", name="p95", line_dash="dot")],
+        layout=dict(title="Generation Time", template=SLIM_TEMPLATE, yaxis_title="seconds")
+    )
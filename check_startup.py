@@ -0,0 +1,75 @@
+"""Cold-start check for Story_app.py
+
+Imports the app in a fresh interpreter, prints the slowest imports from
+``python -X importtime`` and exits non-zero when the import exceeds the time
+budget or pulls in a dependency that should only load when a chart renders.
+
+    python check_startup.py --budget-ms 1500
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Only needed by chart and batch paths, never at import time
+LAZY_MODULES = ["pandas", "numpy"]
+
+BUDGET_MS = float(os.environ.get("STARTUP_BUDGET_MS", 1500))
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import Story_app
+elapsed = time.perf_counter() - start
+print(json.dumps({{"elapsed_ms": elapsed * 1000, "loaded": [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(app_dir: str) -> dict:
+    """Import the app once in a fresh interpreter and collect timings"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(lazy=LAZY_MODULES)],
+        cwd=app_dir, capture_output=True, text=True, check=True,
+        env={**os.environ, "PYTHONPATH": app_dir}
+    )
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Modules imported directly by the app; deeper entries are further indented
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            imports.append((int(cumulative), name.strip()))
+    report["slowest"] = sorted(imports, reverse=True)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    report = measure(os.path.dirname(os.path.abspath(__file__)))
+
+    print(f"Story_app import: {report['elapsed_ms']:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    for cumulative, name in report["slowest"][:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    failures = []
+    if report["elapsed_ms"] > args.budget_ms:
+        failures.append(f"import took {report['elapsed_ms']:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+    if report["loaded"]:
+        failures.append(f"lazy dependencies imported at startup: {', '.join(report['loaded'])}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Concurrent-session load test for the Streamlit app
+
+Runs N simulated browser sessions in one process with Streamlit's AppTest,
+so they share the cached generator, store and job pool exactly like
+sessions on a single server worker. Each session repeats one user action
+and the run reports throughput and latency percentiles.
+
+AppTest installs a process-global runtime for every script run, so runs
+from different sessions take turns; background story jobs still overlap
+with them, and the script runs themselves would contend for the GIL in a
+real worker anyway.
+
+    python load_test.py --sessions 16 --actions 10 --scenario generate
+    python load_test.py --sessions 1,4,16,64 --scenario prompt
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List
+
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Story_app.py")
+
+SCENARIO_MODES = {
+    "generate": "Story Generation",
+    "prompt": "Writing Assistant",
+    "library": "Story Library",
+    "analyze": "Mood Analysis",
+    "analytics": "Analytics"
+}
+
+SAMPLE_TEXT = "I feel so happy and excited today, but the dark night outside is a little scary."
+
+_script_run_lock = threading.Lock()
+
+
+class SessionAppTest(AppTest):
+    """AppTest whose script runs are serialized with other sessions in the process"""
+
+    def _run(self, *args, **kwargs):
+        with _script_run_lock:
+            return super()._run(*args, **kwargs)
+
+
+def wait_for_story(app, poll_seconds: float, timeout: float):
+    """Rerun the session until its generation job has finished, as the polling fragment would"""
+    deadline = time.perf_counter() + timeout
+    while True:
+        job = app.session_state["story_job"] if "story_job" in app.session_state else None
+        if job is None or job.saved:
+            return
+        if time.perf_counter() > deadline:
+            raise TimeoutError("story job did not finish")
+        if not job.done():
+            time.sleep(poll_seconds)
+        app.run()
+
+
+def scenario_action(scenario: str, length: str, poll_seconds: float, timeout: float) -> Callable:
+    """One timed user action for a session already on the scenario's page"""
+    def generate(app):
+        next(radio for radio in app.radio if radio.label == "Story Length").set_value(length)
+        app.button[0].click().run()
+        wait_for_story(app, poll_seconds, timeout)
+
+    def prompt(app):
+        app.button[1].click().run()
+
+    def rerun(app):
+        app.run()
+
+    def analyze(app):
+        app.text_area[0].set_value(SAMPLE_TEXT)
+        app.button[0].click().run()
+
+    return {"generate": generate, "prompt": prompt, "library": rerun, "analyze": analyze, "analytics": rerun}[scenario]
+
+
+def run_session(action: Callable, scenario: str, actions: int, start: threading.Barrier,
+                latencies: List[float], errors: List[str]):
+    try:
+        app = SessionAppTest(APP_PATH, default_timeout=120).run()
+        app.sidebar.radio[0].set_value(SCENARIO_MODES[scenario]).run()
+    except Exception as error:
+        errors.append(f"{type(error).__name__}: {error}")
+        start.wait()
+        return
+    start.wait()
+    for _ in range(actions):
+        began = time.perf_counter()
+        try:
+            action(app)
+            if app.exception:
+                raise RuntimeError(app.exception[0].message)
+        except Exception as error:
+            errors.append(f"{type(error).__name__}: {error}")
+            continue
+        latencies.append(time.perf_counter() - began)
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def run_load(sessions: int, actions: int, scenario: str, length: str, poll_seconds: float, timeout: float) -> Dict:
+    """Run every session concurrently and summarize throughput and latency"""
+    action = scenario_action(scenario, length, poll_seconds, timeout)
+    latencies: List[float] = []
+    errors: List[str] = []
+    # Sessions start their timed actions together, after each has loaded the page
+    start = threading.Barrier(sessions + 1)
+    threads = [threading.Thread(target=run_session, args=(action, scenario, actions, start, latencies, errors))
+               for _ in range(sessions)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    began = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    latencies.sort()
+    result = {"sessions": sessions, "actions": len(latencies), "errors": len(errors),
+              "seconds": elapsed, "throughput": len(latencies) / elapsed if elapsed else 0.0}
+    if latencies:
+        result.update({f"p{int(fraction * 100)}_ms": percentile(latencies, fraction) * 1000
+                       for fraction in (0.5, 0.9, 0.99)})
+        result["max_ms"] = latencies[-1] * 1000
+    if errors:
+        result["first_error"] = errors[0]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", default="8", help="concurrent sessions, or a comma-separated sweep")
+    parser.add_argument("--actions", type=int, default=5, help="timed actions per session")
+    parser.add_argument("--scenario", choices=list(SCENARIO_MODES), default="generate")
+    parser.add_argument("--length", choices=["Short", "Medium", "Long"], default="Medium",
+                        help="story length for the generate scenario")
+    parser.add_argument("--poll-ms", type=float, default=250, help="job polling interval, as in the app")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds before a pending story counts as failed")
+    args = parser.parse_args()
+
+    # Keep load-test stories out of the real library
+    os.environ.setdefault("STORY_DB_PATH", os.path.join(tempfile.mkdtemp(), "load_test.db"))
+
+    print(f"{'sessions':>8} {'actions':>8} {'errors':>7} {'actions/s':>10} "
+          f"{'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    failed = False
+    for sessions in [int(value) for value in args.sessions.split(",")]:
+        result = run_load(sessions, args.actions, args.scenario, args.length, args.poll_ms / 1000, args.timeout)
+        print(f"{result['sessions']:>8} {result['actions']:>8} {result['errors']:>7} {result['throughput']:>10.1f} "
+              + " ".join(f"{result.get(key, float('nan')):>9.1f}" for key in ("p50_ms", "p90_ms", "p99_ms", "max_ms")))
+        if result["errors"]:
+            failed = True
+            print(f"  first error: {result['first_error']}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,114 @@
-# This is a sample Python script.
-
-# Press Shift+F10 to execute it or replace it with your code.
-# Press Double Shift to search everywhere for classes, files, tool windows, actions, and settings.
-
-
-def print_hi(name):
-    # Use a breakpoint in the code line below to debug your script.
-    print(f'Hi, {name}')  # Press Ctrl+F8 to toggle the breakpoint.
-
-
-# Press the green button in the gutter to run the script.
-if __name__ == '__main__':
-    print_hi('PyCharm')
-
-# See PyCharm help at https://www.jetbrains.com/help/pycharm/
+"""Headless entry point for the story generator
+
+    python main.py analyze  -i texts.jsonl  -o moods.jsonl
+    python main.py generate -i specs.jsonl  -o stories.jsonl --workers 8 --seed 42
+    python main.py serve --port 8080 --cache-size 10000
+
+analyze reads objects with a "text" field; generate reads generate_story
+keyword arguments (mood, style, length, user_input, seed, engine). The
+"model" engine uses the model server at STORY_MODEL_URL. --cache-size and
+--cache-path set STORY_CACHE_SIZE and STORY_CACHE_PATH, caching rendered
+stories by recipe; only requests with a seed can repeat one.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from itertools import islice
+from typing import Iterator, List
+
+from model_backend import backend_from_env
+from story_cache import cache_from_env
+from story_generator import MoodToStoryGenerator, iter_generated_stories
+from story_service import build_story_service
+
+
+def read_jsonl(stream) -> Iterator[dict]:
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def batched(items: Iterator, size: int) -> Iterator[List]:
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+def apply_cache_options(args):
+    # Set in the environment so bulk generation worker processes build the same cache
+    if args.cache_size is not None:
+        os.environ["STORY_CACHE_SIZE"] = str(args.cache_size)
+    if args.cache_path is not None:
+        os.environ["STORY_CACHE_PATH"] = args.cache_path
+
+
+def run_analyze(args):
+    generator = MoodToStoryGenerator()
+    for batch in batched(read_jsonl(args.input), args.batch_size):
+        for item, result in zip(batch, generator.analyze_mood_batch([item["text"] for item in batch])):
+            args.output.write(json.dumps({**item, **result}) + "\n")
+
+
+def run_generate(args):
+    apply_cache_options(args)
+    # One master seed for the whole input, so --batch-size only bounds memory and never changes a story
+    for story in iter_generated_stories(read_jsonl(args.input), workers=args.workers, seed=args.seed,
+                                        batch_size=args.batch_size):
+        args.output.write(json.dumps(story) + "\n")
+
+
+def run_serve(args):
+    apply_cache_options(args)
+
+    async def serve():
+        generator = MoodToStoryGenerator(cache=cache_from_env(), backend=backend_from_env())
+        service = build_story_service(generator,
+                                      max_concurrency=args.max_concurrency, max_batch=args.max_batch,
+                                      batch_wait=args.batch_wait_ms / 1000)
+        print(f"Serving on http://{args.host}:{args.port} (POST /analyze, POST /generate)", file=sys.stderr)
+        await service.serve(args.host, args.port)
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless mood analysis and story generation")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name, runner, help_text in [("analyze", run_analyze, "analyze mood for JSONL texts"),
+                                    ("generate", run_generate, "generate stories for JSONL specs")]:
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("-i", "--input", type=argparse.FileType("r"), default=sys.stdin)
+        command.add_argument("-o", "--output", type=argparse.FileType("w"), default=sys.stdout)
+        command.add_argument("--batch-size", type=int, default=1000)
+        command.set_defaults(run=runner)
+    commands.choices["generate"].add_argument("--workers", type=int, default=None)
+    commands.choices["generate"].add_argument("--seed", type=int, default=None)
+
+    serve = commands.add_parser("serve", help="run the async JSON HTTP service")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8080)
+    serve.add_argument("--max-concurrency", type=int, default=64)
+    serve.add_argument("--max-batch", type=int, default=64)
+    serve.add_argument("--batch-wait-ms", type=float, default=5.0)
+    serve.set_defaults(run=run_serve)
+
+    for command in (commands.choices["generate"], serve):
+        command.add_argument("--cache-size", type=int, default=None,
+                             help="cache this many rendered stories in memory (default: STORY_CACHE_SIZE, off)")
+        command.add_argument("--cache-path", default=None,
+                             help="SQLite file for a disk cache tier (default: STORY_CACHE_PATH)")
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+# Upper bounds (seconds) for stage latency histograms
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PREFIX = "story_app"
+
+
+class Metrics:
+    """Thread-safe per-stage timers and event counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timers = {}
+        self._counters = {}
+
+    @contextmanager
+    def timer(self, stage: str):
+        """Time the body of a with-block under stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def timed(self, stage: str):
+        """Decorator form of timer"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            timer = self._timers.get(stage)
+            if timer is None:
+                timer = self._timers[stage] = {"count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * len(BUCKETS)}
+            timer["count"] += 1
+            timer["sum"] += seconds
+            timer["max"] = max(timer["max"], seconds)
+            for index, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    timer["buckets"][index] += 1
+
+    def incr(self, event: str, amount: int = 1):
+        with self._lock:
+            self._counters[event] = self._counters.get(event, 0) + amount
+
+    def snapshot(self) -> Dict:
+        """Copy of the current timers and counters"""
+        with self._lock:
+            return {
+                "timers": {stage: {**timer, "buckets": list(timer["buckets"])} for stage, timer in self._timers.items()},
+                "counters": dict(self._counters)
+            }
+
+    def reset(self):
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+
+    def to_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines = [f"# HELP {PREFIX}_stage_seconds Time spent per stage.",
+                 f"# TYPE {PREFIX}_stage_seconds histogram"]
+        for stage, timer in sorted(snapshot["timers"].items()):
+            for bound, count in zip(BUCKETS, timer["buckets"]):
+                lines.append(f'{PREFIX}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'{PREFIX}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {timer["count"]}')
+            lines.append(f'{PREFIX}_stage_seconds_sum{{stage="{stage}"}} {timer["sum"]:.6f}')
+            lines.append(f'{PREFIX}_stage_seconds_count{{stage="{stage}"}} {timer["count"]}')
+
+        lines += [f"# HELP {PREFIX}_events_total Events counted by the app.",
+                  f"# TYPE {PREFIX}_events_total counter"]
+        for event, count in sorted(snapshot["counters"].items()):
+            lines.append(f'{PREFIX}_events_total{{event="{event}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """Write the Prometheus text export to path, e.g. for a node-exporter textfile collector"""
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as export_file:
+            export_file.write(self.to_prometheus())
+        # Replace atomically so scrapers never read a half-written file
+        os.replace(temp_path, path)
+
+    def serve_prometheus(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serve /metrics from a daemon thread"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+# Process-wide registry shared by the generator and the app
+METRICS = Metrics()
@@ -0,0 +1,222 @@
+"""Model backends for story expansion and enhancement
+
+A backend turns model requests into text. Requests are plain dicts:
+
+    {"task": "expand", "prompt": <opening sentence>, "mood": ..., "style": ...,
+     "max_words": <words to add>, "seed": ...}
+    {"task": "enhance", "prompt": <story text>, "seed": ...}
+
+and the result is the continuation (expand) or the rewritten text (enhance).
+"""
+import abc
+import asyncio
+import http.client
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import urlsplit
+
+from metrics import METRICS
+from story_service import MicroBatcher, UpstreamError
+
+# Statuses worth retrying: the request never reached a healthy model
+RETRY_STATUSES = {429, 502, 503, 504}
+
+# Most bytes taken from a token stream per read
+STREAM_READ_BYTES = 65536
+
+
+class ModelBackendError(UpstreamError):
+    pass
+
+
+class ModelBackend(abc.ABC):
+    """Interface for a text model behind the story generator"""
+
+    @abc.abstractmethod
+    def complete_batch(self, requests: List[Dict]) -> List[str]:
+        """Run several requests in one model call, returning one text per request"""
+
+    def complete(self, request: Dict) -> str:
+        return self.complete_batch([request])[0]
+
+    def stream(self, request: Dict) -> Iterator[str]:
+        """Yield the result text token by token; backends without streaming yield it whole"""
+        yield self.complete(request)
+
+    def close(self):
+        pass
+
+
+class ThreadBatcher:
+    """MicroBatcher for blocking callers on many threads
+
+    The batcher runs on a private event loop thread; submit() blocks the
+    calling thread until its item of the batch result is ready. Batches are
+    counted under the metric name, not the JSON service's.
+    """
+
+    def __init__(self, batch_fn, max_batch: int = 16, max_wait: float = 0.005, metric: str = "model_merged"):
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="model-batcher", daemon=True).start()
+        self._batcher = MicroBatcher(batch_fn, max_batch, max_wait, metric)
+
+    def submit(self, item, timeout: Optional[float] = None):
+        return asyncio.run_coroutine_threadsafe(self._batcher.submit(item), self._loop).result(timeout)
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+class ConnectionPool:
+    """Bounded pool of keep-alive HTTP connections to one host"""
+
+    def __init__(self, host: str, port: int, size: int = 8, timeout: float = 30.0, https: bool = False):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._connection_class = http.client.HTTPSConnection if https else http.client.HTTPConnection
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def connection(self) -> Iterator[http.client.HTTPConnection]:
+        """Borrow a connection; it goes back to the pool unless the block raised"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise ModelBackendError("timed out waiting for a pooled connection")
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connection_class(self.host, self.port, timeout=self.timeout)
+                METRICS.incr("model_connections_opened")
+            try:
+                yield conn
+            except BaseException:
+                # The connection may be mid-response, so it is never reused after an error
+                conn.close()
+                raise
+            self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class HTTPModelBackend(ModelBackend):
+    """Backend for a model served over HTTP
+
+    POST /v1/complete takes {"requests": [...]} and returns {"completions": [...]};
+    POST /v1/stream takes one request and streams NDJSON lines of {"token": ...}.
+    Connections are pooled and kept alive. Failed calls are retried with
+    exponential backoff, and concurrent complete() calls from different
+    threads are merged into batches.
+    """
+
+    def __init__(self, url: str, pool_size: int = 8, timeout: float = 30.0, retries: int = 2,
+                 backoff: float = 0.1, max_batch: int = 16, batch_wait: float = 0.005):
+        parts = urlsplit(url)
+        https = parts.scheme == "https"
+        self.base_path = parts.path.rstrip("/")
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.pool = ConnectionPool(parts.hostname, parts.port or (443 if https else 80), pool_size, timeout, https)
+        self._batcher = ThreadBatcher(self.complete_batch, max_batch, batch_wait)
+
+    def complete(self, request: Dict) -> str:
+        return self._batcher.submit(request, timeout=self.timeout * (self.retries + 1))
+
+    def complete_batch(self, requests: List[Dict]) -> List[str]:
+        METRICS.incr("model_batches")
+        METRICS.incr("model_batched_requests", len(requests))
+        with METRICS.timer("model_complete"):
+            completions = json.loads(self._post("/v1/complete", {"requests": requests}))["completions"]
+        if len(completions) != len(requests):
+            raise ModelBackendError(f"expected {len(requests)} completions, got {len(completions)}")
+        return completions
+
+    def stream(self, request: Dict) -> Iterator[str]:
+        # Retried only until the first token arrives; after that a failure surfaces to the reader
+        started = False
+        for attempt in self._attempts():
+            try:
+                with self.pool.connection() as conn:
+                    response = self._send(conn, "/v1/stream", request)
+                    if response.status != 200:
+                        self._fail(response, attempt)
+                        continue
+                    METRICS.incr("model_streams")
+                    # read1() returns each chunk as it arrives and, unlike readline(), raises
+                    # IncompleteRead when the connection drops mid-body instead of ending quietly
+                    pending = b""
+                    for data in iter(lambda: response.read1(STREAM_READ_BYTES), b""):
+                        *lines, pending = (pending + data).split(b"\n")
+                        for line in lines:
+                            if line.strip():
+                                started = True
+                                yield json.loads(line)["token"]
+                    if pending.strip():
+                        yield json.loads(pending)["token"]
+                    return
+            except (OSError, http.client.HTTPException) as error:
+                if started:
+                    raise ModelBackendError(f"model stream broke off: {error}") from error
+                self._retry_or_raise(error, attempt)
+
+    def close(self):
+        self._batcher.close()
+        self.pool.close()
+
+    def _post(self, path: str, payload: Dict) -> bytes:
+        for attempt in self._attempts():
+            try:
+                with self.pool.connection() as conn:
+                    response = self._send(conn, path, payload)
+                    body = response.read()
+                    if response.status == 200:
+                        return body
+                    self._fail(response, attempt, body)
+            except (OSError, http.client.HTTPException) as error:
+                self._retry_or_raise(error, attempt)
+
+    def _send(self, conn: http.client.HTTPConnection, path: str, payload: Dict) -> http.client.HTTPResponse:
+        conn.request("POST", self.base_path + path, body=json.dumps(payload).encode(),
+                     headers={"Content-Type": "application/json"})
+        return conn.getresponse()
+
+    def _attempts(self) -> Iterator[int]:
+        for attempt in range(self.retries + 1):
+            if attempt:
+                METRICS.incr("model_retries")
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            yield attempt
+        raise ModelBackendError(f"model request failed after {self.retries + 1} attempts")
+
+    def _fail(self, response: http.client.HTTPResponse, attempt: int, body: Optional[bytes] = None):
+        if body is None:
+            body = response.read()
+        if response.status not in RETRY_STATUSES or attempt == self.retries:
+            raise ModelBackendError(f"model returned {response.status}: {body[:200].decode(errors='replace')}")
+
+    def _retry_or_raise(self, error: Exception, attempt: int):
+        if attempt == self.retries:
+            raise ModelBackendError(f"model request failed: {error}") from error
+
+
+def backend_from_env() -> Optional[ModelBackend]:
+    """HTTP backend for STORY_MODEL_URL, or None to keep the built-in engines"""
+    url = os.environ.get("STORY_MODEL_URL")
+    if not url:
+        return None
+    return HTTPModelBackend(url, pool_size=int(os.environ.get("STORY_MODEL_POOL_SIZE", 8)),
+                            timeout=float(os.environ.get("STORY_MODEL_TIMEOUT", 30)))
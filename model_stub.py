@@ -0,0 +1,134 @@
+"""Local stub model server for development and tests
+
+Speaks the HTTPModelBackend protocol with deterministic output: story
+expansions come from the n-gram engine and enhancements append a passage
+for the text's detected mood. Latency can be simulated per call and per
+token, and failures by answering the first calls with 503 or cutting
+streams short.
+
+    python model_stub.py --port 8765 --token-delay-ms 5
+    STORY_MODEL_URL=http://127.0.0.1:8765 streamlit run Story_app.py
+"""
+import argparse
+import asyncio
+import json
+import sys
+import threading
+from http import HTTPStatus
+from itertools import islice
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+import ngram_engine
+from mood_scorer import DEFAULT_SCORER
+from story_generator import STORY_EXPANSIONS
+from story_service import HTTPError, JSONService
+
+
+def stub_tokens(request: Dict) -> Iterator[str]:
+    """Deterministic token stream for a model request"""
+    task = request.get("task")
+    prompt = request.get("prompt", "")
+    if task == "expand":
+        seed_words = len(prompt.split())
+        chunks = ngram_engine.expand_stream(prompt, request["mood"], seed_words + int(request["max_words"]),
+                                            int(request.get("seed") or 0))
+        if seed_words:
+            next(chunks)  # the engine echoes the prompt first; the model returns only the continuation
+        for chunk in chunks:
+            yield from (f" {word}" for word in chunk.split())
+    elif task == "enhance":
+        mood = DEFAULT_SCORER.score(prompt)["dominant_mood"]
+        yield prompt.rstrip()
+        yield from (f" {word}" if index else f"\n\n{word}"
+                    for index, word in enumerate(STORY_EXPANSIONS[mood].split()))
+    else:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"unknown task {task!r}")
+
+
+def cut_short(tokens: Iterator[str], count: int) -> Iterator[str]:
+    yield from islice(tokens, count)
+    # Raised mid-response, which makes the service drop the connection
+    raise ConnectionAbortedError("simulated broken stream")
+
+
+def build_stub_service(token_delay: float = 0.0, call_latency: float = 0.0, fail_first: int = 0,
+                       break_after_tokens: Optional[int] = None) -> JSONService:
+    """JSON service exposing /v1/complete and /v1/stream
+
+    The first fail_first calls are answered with 503, and with
+    break_after_tokens every stream drops its connection after that many tokens.
+    """
+    # Every expansion walks an n-gram table, so build them all before the first request
+    ngram_engine.precompute_models()
+    calls = {"count": 0}
+
+    def check_failure():
+        calls["count"] += 1
+        if calls["count"] <= fail_first:
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "simulated failure")
+
+    async def complete(request: Dict) -> Dict:
+        check_failure()
+        requests: List[Dict] = request["requests"]
+        await asyncio.sleep(call_latency)
+        # One simulated model call serves the whole batch
+        return {"completions": ["".join(stub_tokens(item)) for item in requests]}
+
+    async def stream(request: Dict) -> AsyncIterator[bytes]:
+        check_failure()
+        tokens = stub_tokens(request)
+        if break_after_tokens is not None:
+            tokens = cut_short(tokens, break_after_tokens)
+        first = next(tokens, None)  # validate before the 200 status line goes out
+
+        async def lines() -> AsyncIterator[bytes]:
+            await asyncio.sleep(call_latency)
+            if first is not None:
+                yield json.dumps({"token": first}).encode() + b"\n"
+            for token in tokens:
+                if token_delay:
+                    await asyncio.sleep(token_delay)
+                yield json.dumps({"token": token}).encode() + b"\n"
+
+        return lines()
+
+    return JSONService({"/v1/complete": complete, "/v1/stream": stream})
+
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0, **options) -> str:
+    """Run the stub on a daemon thread and return its base URL; port 0 picks a free port"""
+    started = threading.Event()
+    address = {}
+
+    def run():
+        async def serve():
+            server = await asyncio.start_server(build_stub_service(**options).handle_connection, host, port)
+            address["port"] = server.sockets[0].getsockname()[1]
+            started.set()
+            async with server:
+                await server.serve_forever()
+        asyncio.run(serve())
+
+    threading.Thread(target=run, name="model-stub", daemon=True).start()
+    started.wait()
+    return f"http://{host}:{address['port']}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--token-delay-ms", type=float, default=0.0, help="simulated time per streamed token")
+    parser.add_argument("--call-latency-ms", type=float, default=0.0, help="simulated time per model call")
+    args = parser.parse_args()
+
+    service = build_stub_service(args.token_delay_ms / 1000, args.call_latency_ms / 1000)
+    print(f"Stub model on http://{args.host}:{args.port} (POST /v1/complete, POST /v1/stream)", file=sys.stderr)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
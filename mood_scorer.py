@@ -0,0 +1,228 @@
+import multiprocessing
+import os
+import re
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+MOOD_KEYWORDS = {
+    "Joyful": ["happy", "excited", "wonderful", "amazing", "beautiful", "love", "fantastic"],
+    "Melancholic": ["sad", "lonely", "miss", "lost", "empty", "regret", "memory"],
+    "Mysterious": ["secret", "mystery", "unknown", "hidden", "curious", "strange"],
+    "Romantic": ["love", "heart", "romance", "passion", "kiss", "darling", "sweet"],
+    "Adventurous": ["adventure", "explore", "journey", "discover", "risk", "brave"],
+    "Whimsical": ["magic", "dream", "fantasy", "imagine", "wonder", "magical"],
+    "Horror": ["scary", "fear", "dark", "terror", "ghost", "haunted"],
+    "Nostalgic": ["remember", "past", "childhood", "old", "memory", "traditional"]
+}
+
+INTENSITY_INDICATORS = ["very", "extremely", "really", "so", "absolutely"]
+
+KEYWORD_WEIGHT = 2
+INTENSITY_STEP = 0.5
+MAX_INTENSITY = 3
+DEFAULT_MOOD = "Joyful"
+
+# Documents smaller than this are scored in-process; a pool would cost more than it saves
+PARALLEL_MIN_CHARS = 200_000
+
+_HEADING_NUMBERS = ("one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten", "eleven",
+                    "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen", "nineteen",
+                    "twenty")
+
+# A heading is a short line of its own after a blank line, "Chapter 3", "PART TWO: The Storm" or
+# Markdown's "# Chapter 1", so wrapped prose that happens to start with "Part of..." or "Book after..."
+# never splits a section
+_CHAPTER_RE = re.compile(
+    r"(?:\A|\n[ \t\r]*\n)[ \t]*(?:#{1,6}[ \t]*)?"
+    rf"((?:chapter|part|book)[ \t]+(?:\d+|[ivxlc]+|{'|'.join(_HEADING_NUMBERS)})\b"
+    r"(?:[ \t]*[:.\-–—][^\n]{0,50})?)"
+    r"[ \t\r]*(?=\n|\Z)",
+    re.IGNORECASE
+)
+
+
+class MoodScorer:
+    """Precompiled, token-aware keyword scorer shared across calls
+
+    All keywords and intensity indicators are folded into one word-bounded
+    regex, so a text is scanned once regardless of how many keywords exist.
+    """
+
+    def __init__(self, keywords: Dict[str, List[str]] = None,
+                 indicators: Sequence[str] = INTENSITY_INDICATORS):
+        keywords = keywords or MOOD_KEYWORDS
+        self.moods = list(keywords)
+
+        vocabulary = sorted({word for words in keywords.values() for word in words} | set(indicators))
+        self.vocabulary = {word: index for index, word in enumerate(vocabulary)}
+        self.indicators = list(indicators)
+
+        # Each vocabulary word maps to the mood columns it contributes to
+        self.weight_rows = [
+            [KEYWORD_WEIGHT if word in keywords[mood] else 0 for mood in self.moods]
+            for word in vocabulary
+        ]
+
+        # Longest alternatives first so "magical" is never cut short at "magic"
+        alternation = "|".join(re.escape(word) for word in sorted(vocabulary, key=len, reverse=True))
+        self.pattern = re.compile(rf"\b(?:{alternation})\b")
+
+        self._word_moods = {
+            word: [(self.moods[column], weight) for column, weight in enumerate(row) if weight]
+            for word, row in zip(vocabulary, self.weight_rows)
+        }
+        self._indicators = frozenset(indicators)
+        self._matrices = None
+
+    def score(self, text: str) -> Dict:
+        """Score a single text in one pass"""
+        counts = Counter(self.pattern.findall(text.lower()))
+
+        mood_scores = {mood: 0 for mood in self.moods}
+        intensity = 1
+        for word, count in counts.items():
+            for mood, weight in self._word_moods[word]:
+                mood_scores[mood] += count * weight
+            if word in self._indicators:
+                intensity += INTENSITY_STEP
+
+        return self._result(mood_scores, intensity, len(text.split()))
+
+    def score_batch(self, texts: Iterable[str]) -> List[Dict]:
+        """Score many texts at once with vectorized counting"""
+        texts = list(texts)
+        if not texts:
+            return []
+
+        # numpy is only needed for batches, so it is imported on first use
+        import numpy as np
+        mood_weights, indicator_columns = self._batch_matrices()
+
+        vocabulary = self.vocabulary
+        token_ids = []
+        doc_ids = []
+        word_counts = np.empty(len(texts), dtype=np.int64)
+        for doc, text in enumerate(texts):
+            matches = [vocabulary[word] for word in self.pattern.findall(text.lower())]
+            token_ids.extend(matches)
+            doc_ids.extend([doc] * len(matches))
+            word_counts[doc] = len(text.split())
+
+        # One bincount over (document, word) cells gives the full count matrix
+        width = len(vocabulary)
+        flat = np.asarray(doc_ids, dtype=np.intp) * width + np.asarray(token_ids, dtype=np.intp)
+        counts = np.bincount(flat, minlength=len(texts) * width).reshape(len(texts), width)
+
+        scores = counts @ mood_weights
+        intensity = 1 + INTENSITY_STEP * (counts[:, indicator_columns] > 0).sum(axis=1)
+
+        return [
+            self._result(dict(zip(self.moods, row.tolist())), float(level), int(words))
+            for row, level, words in zip(scores, intensity, word_counts)
+        ]
+
+    def _batch_matrices(self):
+        if self._matrices is None:
+            import numpy as np
+            self._matrices = (
+                np.array(self.weight_rows, dtype=np.int64),
+                np.array([self.vocabulary[word] for word in self.indicators], dtype=np.intp)
+            )
+        return self._matrices
+
+    def _result(self, mood_scores: Dict[str, int], intensity: float, word_count: int) -> Dict:
+        dominant_mood = max(mood_scores, key=mood_scores.get)
+        return {
+            "dominant_mood": dominant_mood if mood_scores[dominant_mood] > 0 else DEFAULT_MOOD,
+            "mood_scores": mood_scores,
+            "intensity": min(intensity, MAX_INTENSITY),
+            "word_count": word_count
+        }
+
+
+# Built once per process and shared by every generator instance
+DEFAULT_SCORER = MoodScorer()
+
+
+def split_sections(text: str, window_words: int = 2000) -> List[Tuple[str, str]]:
+    """Split a document into (label, text) sections
+
+    Chapter headings ("Chapter 3", "PART TWO", ...) are used when the text has
+    at least two of them; otherwise the text is cut into fixed word windows.
+    """
+    headings = list(_CHAPTER_RE.finditer(text))
+    if len(headings) >= 2:
+        sections = []
+        if text[:headings[0].start()].strip():
+            sections.append(("Opening", text[:headings[0].start()]))
+        for heading, following in zip(headings, headings[1:] + [None]):
+            end = following.start() if following else len(text)
+            sections.append((heading.group(1).strip()[:40], text[heading.end():end]))
+        return sections
+
+    words = text.split()
+    return [
+        (f"Words {start + 1}-{min(start + window_words, len(words))}", " ".join(words[start:start + window_words]))
+        for start in range(0, len(words), window_words)
+    ]
+
+
+def _score_sections(texts: List[str]) -> List[Dict]:
+    return DEFAULT_SCORER.score_batch(texts)
+
+
+_timeline_pool: Optional[ProcessPoolExecutor] = None
+_timeline_pool_lock = threading.Lock()
+
+
+def timeline_pool() -> ProcessPoolExecutor:
+    """Process pool shared by every timeline in this process
+
+    Workers are started with forkserver (or spawn where that is missing), so
+    they are never forked from a multi-threaded server such as Streamlit.
+    """
+    global _timeline_pool
+    with _timeline_pool_lock:
+        if _timeline_pool is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _timeline_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                                 mp_context=multiprocessing.get_context(method))
+        return _timeline_pool
+
+
+def mood_timeline(text: str, window_words: int = 2000, workers: Optional[int] = None) -> List[Dict]:
+    """Score each section of a long document, in parallel for large inputs
+
+    Returns one entry per section, in document order, with its label and the
+    usual analyze_mood_text fields.
+    """
+    sections = split_sections(text, window_words)
+    labels = [label for label, _ in sections]
+    texts = [section for _, section in sections]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(texts) < 2 or len(text) < PARALLEL_MIN_CHARS:
+        results = DEFAULT_SCORER.score_batch(texts)
+    else:
+        # Contiguous slices keep each worker's batch vectorized and results in order
+        size = -(-len(texts) // workers)
+        slices = [texts[start:start + size] for start in range(0, len(texts), size)]
+        results = [result for batch in timeline_pool().map(_score_sections, slices) for result in batch]
+
+    return [{"section": label, **result} for label, result in zip(labels, results)]
+
+
+def document_mood(timeline: List[Dict]) -> Dict:
+    """Whole-document analysis from a mood timeline, without scanning the text again
+
+    Mood scores and word counts are summed over the sections; intensity is
+    that of the most intense section.
+    """
+    mood_scores = Counter()
+    for section in timeline:
+        mood_scores.update(section["mood_scores"])
+    return DEFAULT_SCORER._result({mood: mood_scores[mood] for mood in DEFAULT_SCORER.moods},
+                                  max((section["intensity"] for section in timeline), default=1),
+                                  sum(section["word_count"] for section in timeline))
@@ -0,0 +1,127 @@
+from functools import lru_cache
+from itertools import cycle, islice
+from typing import Iterator, List, NamedTuple
+
+import numpy as np
+
+from story_generator import STORY_ELEMENTS, STORY_EXPANSIONS, STORY_TEMPLATES
+
+ORDER = 2
+SAMPLE_BATCH = 8192
+CHUNK_WORDS = 256
+
+
+class NgramModel(NamedTuple):
+    """Order-n Markov chain stored as CSR arrays
+
+    States are n-word windows. The transitions of state s are
+    targets[offsets[s]:offsets[s + 1]], repeated in proportion to how often
+    they occur, so a uniform pick within the row samples by frequency.
+    The walk_* lists hold the same tables as plain lists, built once, since
+    stepping through Python lists beats indexing numpy arrays one at a time.
+    """
+    vocabulary: List[str]
+    emissions: np.ndarray  # last word id of each state
+    offsets: np.ndarray
+    targets: np.ndarray
+    word_states: dict  # first state ending in each word, for seeding the chain
+    walk_emissions: List[int]
+    walk_offsets: List[int]
+    walk_targets: List[int]
+
+
+def mood_corpus(mood: str) -> List[str]:
+    """Training words for a mood: its templates filled with every element, each round followed by its expansion passage"""
+    passage = STORY_EXPANSIONS[mood].split()
+    fill_count = max(len(values) for values in STORY_ELEMENTS.values())
+    fills = zip(*(islice(cycle(STORY_ELEMENTS[kind]), fill_count)
+                  for kind in ("characters", "settings", "conflicts")))
+    words = []
+    for character, setting, conflict in fills:
+        for template in STORY_TEMPLATES[mood]:
+            words.extend(template.format(character=character, setting=setting, element=conflict).split())
+        words.extend(passage)
+    return words
+
+
+@lru_cache(maxsize=None)
+def build_model(mood: str, order: int = ORDER) -> NgramModel:
+    """Build (once per process) the transition tables for a mood"""
+    words = mood_corpus(mood)
+    vocabulary = sorted(set(words))
+    word_ids = {word: index for index, word in enumerate(vocabulary)}
+    # The corpus is treated as cyclic so every state has at least one successor
+    ids = [word_ids[word] for word in words]
+    ids = ids + ids[:order]
+
+    state_ids = {}
+    sequence = []
+    for position in range(len(words)):
+        window = tuple(ids[position:position + order])
+        sequence.append(state_ids.setdefault(window, len(state_ids)))
+    sequence.append(sequence[0])
+
+    sources = np.asarray(sequence[:-1], dtype=np.int32)
+    destinations = np.asarray(sequence[1:], dtype=np.int32)
+    by_source = np.argsort(sources, kind="stable")
+    counts = np.bincount(sources, minlength=len(state_ids))
+
+    emissions = np.empty(len(state_ids), dtype=np.int32)
+    for window, state in state_ids.items():
+        emissions[state] = window[-1]
+    word_states = {}
+    for state, word in enumerate(emissions.tolist()):
+        word_states.setdefault(vocabulary[word], state)
+
+    offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int32)
+    targets = destinations[by_source]
+    return NgramModel(
+        vocabulary=vocabulary,
+        emissions=emissions,
+        offsets=offsets,
+        targets=targets,
+        word_states=word_states,
+        walk_emissions=emissions.tolist(),
+        walk_offsets=offsets.tolist(),
+        walk_targets=targets.tolist()
+    )
+
+
+def precompute_models():
+    """Build every mood's tables up front"""
+    for mood in STORY_EXPANSIONS:
+        build_model(mood)
+
+
+def expand_stream(seed_text: str, mood: str, target_words: int, rng_seed: int) -> Iterator[str]:
+    """Yield the seed sentence followed by chain-generated words, up to target_words"""
+    model = build_model(mood)
+    rng = np.random.default_rng(rng_seed)
+
+    seed_words = seed_text.split()[:target_words]
+    if seed_words:
+        yield " ".join(seed_words)
+    remaining = target_words - len(seed_words)
+
+    state = model.word_states.get(seed_words[-1] if seed_words else "")
+    if state is None:
+        state = int(rng.integers(len(model.emissions)))
+
+    # Plain lists make the sequential walk cheap; the random draws come from numpy in batches
+    offsets = model.walk_offsets
+    targets = model.walk_targets
+    emissions = model.walk_emissions
+    vocabulary = model.vocabulary
+
+    separator = " " if seed_words else ""
+    while remaining > 0:
+        draws = rng.random(min(SAMPLE_BATCH, remaining)).tolist()
+        for start in range(0, len(draws), CHUNK_WORDS):
+            chunk = []
+            for draw in draws[start:start + CHUNK_WORDS]:
+                low = offsets[state]
+                state = targets[low + int(draw * (offsets[state + 1] - low))]
+                chunk.append(vocabulary[emissions[state]])
+            yield separator + " ".join(chunk)
+            separator = " "
+        remaining -= len(draws)
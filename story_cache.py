@@ -0,0 +1,119 @@
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS generation_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_generation_cache_accessed ON generation_cache (accessed_at);
+"""
+
+
+def request_key(**params) -> str:
+    """Hash normalized request parameters into a stable cache key"""
+    normalized = {name: value.strip() if isinstance(value, str) else value for name, value in params.items()}
+    payload = json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class StoryCache:
+    """Content-addressed LRU cache for generated stories
+
+    Entries live in a bounded in-memory LRU. When a path is given, they are
+    also written to a bounded SQLite tier that survives restarts and refills
+    the memory tier on a miss.
+    """
+
+    def __init__(self, max_entries: int = 1024, path: Optional[str] = None, max_disk_entries: int = 100000):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            with self._conn:
+                # Bulk generation workers in other processes may share the file
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.executescript(SCHEMA)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return a copy of the cached value, or None on a miss"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(value)
+
+            if self._conn is not None:
+                row = self._conn.execute("SELECT value FROM generation_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    with self._conn:
+                        self._conn.execute("UPDATE generation_cache SET accessed_at = ? WHERE key = ?",
+                                           (time.time(), key))
+                    value = json.loads(row[0])
+                    self._remember(key, value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return copy.deepcopy(value)
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: Dict):
+        """Store a copy of value under key, evicting the least recently used entries"""
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._remember(key, value)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("INSERT OR REPLACE INTO generation_cache (key, value, accessed_at)"
+                                       " VALUES (?, ?, ?)", (key, json.dumps(value), time.time()))
+                    self._conn.execute("DELETE FROM generation_cache WHERE key IN (SELECT key FROM generation_cache"
+                                       " ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)", (self.max_disk_entries,))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM generation_cache")
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries)
+            }
+
+    def _remember(self, key: str, value: Dict):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+def cache_from_env() -> Optional[StoryCache]:
+    """Cache sized by STORY_CACHE_SIZE (with a disk tier at STORY_CACHE_PATH), or None when unset"""
+    size = int(os.environ.get("STORY_CACHE_SIZE", 0) or 0)
+    if not size:
+        return None
+    return StoryCache(size, os.environ.get("STORY_CACHE_PATH") or None)
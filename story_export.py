@@ -0,0 +1,66 @@
+import json
+import re
+import tempfile
+import zipfile
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional, Tuple
+
+EXPORT_FORMATS = {
+    "ZIP of text files": (".zip", "application/zip"),
+    "JSONL": (".jsonl", "application/jsonl")
+}
+
+# Exports up to this size stay in memory; larger ones spill to an unnamed temporary file
+EXPORT_SPOOL_BYTES = 16 * 1024 * 1024
+
+
+def story_to_text(story_data: Dict) -> str:
+    """Plain-text rendering used for single and bulk exports"""
+    return f"Title: {story_data['title']}\n\n{story_data['story']}\n\nGenerated: {story_data['generated_at']}"
+
+
+def iter_stories(store, generator, query: Optional[str] = None, *, owner: Optional[str] = None,
+                 **facets: Optional[str]) -> Iterator[Tuple[int, Dict]]:
+    """Regenerate matching library stories one at a time"""
+    for story_id, record in store.iter_records(query, owner=owner, **facets):
+        yield story_id, generator.render_story(record)
+
+
+def write_zip(stories: Iterable[Tuple[int, Dict]], fileobj) -> int:
+    """Write each story as a text file into a ZIP archive, returning the count"""
+    count = 0
+    with zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for story_id, story_data in stories:
+            slug = re.sub(r"[^a-z0-9]+", "_", story_data["title"].lower()).strip("_")
+            archive.writestr(f"story_{story_id}_{slug}.txt", story_to_text(story_data))
+            count += 1
+    return count
+
+
+def write_jsonl(stories: Iterable[Tuple[int, Dict]], fileobj) -> int:
+    """Write one JSON object per story, returning the count"""
+    count = 0
+    for story_id, story_data in stories:
+        line = json.dumps({"id": story_id, **story_data}, ensure_ascii=False)
+        fileobj.write(line.encode() + b"\n")
+        count += 1
+    return count
+
+
+def export_library(store, generator, export_format: str, query: Optional[str] = None, *,
+                   owner: Optional[str] = None, **facets: Optional[str]) -> Tuple[BinaryIO, int]:
+    """Stream matching stories into a spooled temporary file and return (file, count)
+
+    Stories are rendered and written one by one, so only the current story and
+    the file buffer are held in memory. The file has no name on disk and is
+    gone once closed or garbage collected; the caller should close it.
+    """
+    suffix, _ = EXPORT_FORMATS[export_format]
+    writer = write_zip if suffix == ".zip" else write_jsonl
+    fileobj = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES)
+    try:
+        count = writer(iter_stories(store, generator, query, owner=owner, **facets), fileobj)
+    except BaseException:
+        fileobj.close()
+        raise
+    fileobj.seek(0)
+    return fileobj, count
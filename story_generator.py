@@ -0,0 +1,495 @@
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+from types import MappingProxyType
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from metrics import METRICS
+from mood_scorer import DEFAULT_SCORER, mood_timeline
+from story_cache import StoryCache, cache_from_env, request_key
+
+
+# Story templates based on mood
+STORY_TEMPLATES = MappingProxyType({
+    "Joyful": (
+        "In a world filled with laughter, {character} discovered {element} that brought joy to everyone around.",
+        "The sun shone brightly as {character} embarked on a delightful journey to {setting}."
+    ),
+    "Melancholic": (
+        "As the rain fell softly, {character} remembered the days when {setting} was filled with life and laughter.",
+        "In the quiet emptiness of {setting}, {character} contemplated the meaning of {element}."
+    ),
+    "Mysterious": (
+        "When {character} found the ancient {element} in {setting}, little did they know it would unravel a centuries-old secret.",
+        "The mysterious events in {setting} led {character} on a quest to uncover the truth about {element}."
+    ),
+    "Romantic": (
+        "Under the starlit sky of {setting}, {character} found love in the most unexpected place while searching for {element}.",
+        "The story of {character}'s heart began in {setting}, where {element} brought two souls together."
+    ),
+    "Adventurous": (
+        "With courage in heart, {character} ventured into {setting} to discover the legendary {element}.",
+        "The perilous journey through {setting} tested {character}'s resolve to secure {element}."
+    ),
+    "Whimsical": (
+        "In a land where dreams came alive, {character} discovered that {setting} held the magical {element}.",
+        "Through the rainbow portal, {character} entered {setting} where {element} awaited with wonder."
+    ),
+    "Horror": (
+        "The shadows in {setting} whispered secrets that {character} wished they never uncovered about {element}.",
+        "When {character} found the cursed {element} in {setting}, the nightmare began."
+    ),
+    "Nostalgic": (
+        "Returning to {setting} after years, {character} rediscovered {element} that brought back cherished memories.",
+        "The old photograph led {character} back to {setting}, where the story of {element} unfolded."
+    )
+})
+
+# Expansion passages per mood (would be replaced with actual AI model in production)
+STORY_EXPANSIONS = MappingProxyType({
+    "Joyful": "The air was filled with the scent of blooming flowers as birds sang cheerful melodies. Every step brought new discoveries and happy encounters with friendly creatures who shared their wisdom and laughter.",
+    "Melancholic": "The gentle breeze carried memories of times long past, each whisper echoing through the empty spaces where joy once resided. Time moved slowly, as if respecting the weight of the moments being remembered.",
+    "Mysterious": "Shadows danced in the corners, hiding secrets that begged to be uncovered. Every clue led to deeper questions, and the truth seemed to shift with each passing moment.",
+    "Romantic": "Hearts beat in synchrony as fate wove its invisible threads between souls destined to meet. Every glance held unspoken promises, and every touch sparked constellations of emotion.",
+    "Adventurous": "Danger lurked around every corner, but so did opportunity. The path ahead was uncertain, but the call of discovery was stronger than any fear that tried to hold back progress.",
+    "Whimsical": "Reality bent in delightful ways, where impossible things became ordinary and magic was as common as sunlight. The rules of physics took a holiday, allowing wonder to reign supreme.",
+    "Horror": "Silence screamed louder than any sound, and the darkness seemed to breathe with malicious intent. Every shadow held potential threats, and trust became a dangerous luxury.",
+    "Nostalgic": "The past reached through time with gentle hands, reminding of lessons learned and loves lost. Each memory was a treasure, carefully preserved in the museum of the heart."
+})
+
+# Expansion passages split into words once, so generation never re-parses them
+EXPANSION_WORDS = MappingProxyType({mood: tuple(text.split()) for mood, text in STORY_EXPANSIONS.items()})
+
+# Emotional arc stages and intensities per mood
+EMOTIONAL_ARCS = MappingProxyType({
+    "Joyful": (("Beginning", 0.7), ("Rising", 0.9), ("Climax", 1.0), ("Resolution", 0.8)),
+    "Melancholic": (("Beginning", 0.3), ("Rising", 0.5), ("Climax", 0.8), ("Resolution", 0.4)),
+    "Mysterious": (("Beginning", 0.4), ("Rising", 0.7), ("Climax", 0.9), ("Resolution", 0.6)),
+    "Romantic": (("Beginning", 0.6), ("Rising", 0.8), ("Climax", 0.95), ("Resolution", 0.85)),
+    "Adventurous": (("Beginning", 0.5), ("Rising", 0.8), ("Climax", 0.9), ("Resolution", 0.7)),
+    "Whimsical": (("Beginning", 0.8), ("Rising", 0.9), ("Climax", 0.95), ("Resolution", 0.85)),
+    "Horror": (("Beginning", 0.3), ("Rising", 0.6), ("Climax", 0.2), ("Resolution", 0.5)),
+    "Nostalgic": (("Beginning", 0.4), ("Rising", 0.7), ("Climax", 0.8), ("Resolution", 0.6))
+})
+
+LENGTH_WORDS = MappingProxyType({"Short": 100, "Medium": 300, "Long": 600})
+
+STORY_ELEMENTS = MappingProxyType({
+    "characters": ("detective", "artist", "scientist", "traveler", "student", "warrior", "dreamer", "explorer"),
+    "settings": ("ancient forest", "futuristic city", "seaside village", "mountain monastery", "desert oasis",
+                 "underground library"),
+    "conflicts": ("lost treasure", "forbidden love", "ancient prophecy", "technological revolution",
+                  "family secret", "cosmic mystery")
+})
+
+# Expansion engines: "classic" reshuffles the seed passage, "ngram" walks a per-mood Markov chain,
+# "model" asks the generator's model backend
+EXPANSION_ENGINES = ("classic", "ngram", "model")
+
+# Placeholder used by the Writing Assistant when no model backend is configured
+ENHANCEMENT_NOTE = "\n\n[Enhanced with richer descriptions and emotional depth]"
+
+
+# Seeds for unseeded requests come from the OS, not the shared module RNG
+_seed_source = random.SystemRandom()
+
+class StoryRecord(NamedTuple):
+    """Compact story recipe; the text and arc are regenerated on demand
+
+    Model-written text is the exception: a model need not write the same
+    story twice, so its output is kept in text once the story is finished.
+    """
+    mood: str
+    style: str
+    target_words: int
+    template_index: int
+    character_index: int
+    setting_index: int
+    conflict_index: int
+    seed: int
+    created_at: float
+    engine: str = "classic"
+    text: Optional[str] = None
+
+
+class MoodToStoryGenerator:
+    def __init__(self, cache: Optional[StoryCache] = None, backend=None):
+        # Optional cache of rendered story text, keyed on the recipe
+        self.cache = cache
+        # Optional model_backend.ModelBackend for the "model" engine and story enhancement
+        self.backend = backend
+
+        self.moods = {
+            "Joyful": {"emoji": "😊", "colors": ["#FFD93D", "#6BCF7F"], "genre": "Adventure/Comedy"},
+            "Melancholic": {"emoji": "😔", "colors": ["#95B8D1", "#6C5B7B"], "genre": "Drama/Reflective"},
+            "Mysterious": {"emoji": "🕵️", "colors": ["#2D3047", "#419D78"], "genre": "Mystery/Thriller"},
+            "Romantic": {"emoji": "❤️", "colors": ["#FF6B6B", "#FFA5A5"], "genre": "Romance/Drama"},
+            "Adventurous": {"emoji": "🏔️", "colors": ["#355070", "#6D597A"], "genre": "Action/Adventure"},
+            "Whimsical": {"emoji": "🌈", "colors": ["#9B5DE5", "#F15BB5"], "genre": "Fantasy/Fairy Tale"},
+            "Horror": {"emoji": "👻", "colors": ["#2D1B2E", "#8B1E3F"], "genre": "Horror/Suspense"},
+            "Nostalgic": {"emoji": "📻", "colors": ["#8F754F", "#D4B483"], "genre": "Historical/Memoir"}
+        }
+
+        self.story_elements = {kind: list(values) for kind, values in STORY_ELEMENTS.items()}
+
+        self.writing_styles = [
+            "Descriptive", "Dialogue-heavy", "Poetic", "Fast-paced", "Reflective", "Suspenseful"
+        ]
+
+    @METRICS.timed("analysis")
+    def analyze_mood_text(self, text: str) -> Dict:
+        """Analyze text input to detect mood"""
+        return DEFAULT_SCORER.score(text)
+
+    @METRICS.timed("analysis_batch")
+    def analyze_mood_batch(self, texts: List[str]) -> List[Dict]:
+        """Analyze many texts at once, in input order"""
+        return DEFAULT_SCORER.score_batch(texts)
+
+    @METRICS.timed("mood_timeline")
+    def analyze_mood_timeline(self, text: str, window_words: int = 2000,
+                              workers: Optional[int] = None) -> List[Dict]:
+        """Per-section mood timeline for a long document"""
+        return mood_timeline(text, window_words, workers)
+
+    @METRICS.timed("generation")
+    def generate_story(self, mood: str, user_input: str = "", style: str = "Descriptive",
+                       length: Union[str, int] = "Medium", seed: Optional[int] = None,
+                       engine: str = "classic") -> Dict:
+        """Generate story based on mood and parameters"""
+        return self.render_story(self.plan_story(mood, style, length, seed, engine))
+
+    @METRICS.timed("generation_batch")
+    def generate_story_batch(self, specs: List[Dict]) -> List[Union[Dict, Exception]]:
+        """Generate a story per spec of generate_story keyword arguments, in order
+
+        Model expansions for the whole batch go to the backend in one call. A
+        spec that fails gets its exception in its slot instead of a story.
+        """
+        results: List[Union[Dict, Exception]] = []
+        model_slots = []
+        for spec in specs:
+            try:
+                params = dict(spec)
+                params.pop("user_input", None)
+                record = self.plan_story(**params)
+                if record.engine == "model":
+                    model_slots.append((len(results), record))
+                    results.append(None)
+                else:
+                    results.append(self.render_story(record))
+            except Exception as error:
+                results.append(error)
+
+        if model_slots:
+            try:
+                stories = self.render_stories([record for _, record in model_slots])
+            except Exception as error:
+                stories = [error] * len(model_slots)
+            for (slot, _), story in zip(model_slots, stories):
+                results[slot] = story
+        return results
+
+    def generate_story_stream(self, mood: str, user_input: str = "", style: str = "Descriptive",
+                              length: Union[str, int] = "Medium", seed: Optional[int] = None,
+                              engine: str = "classic") -> Tuple[Dict, Iterator[str]]:
+        """Plan a story and return its metadata with a lazy stream of text chunks
+
+        The returned dict has no "story" text yet; callers join or render the
+        chunks and fill in "story" and "length" themselves. Passing a seed makes
+        the story reproducible.
+        """
+        return self.render_story_stream(self.plan_story(mood, style, length, seed, engine))
+
+    def plan_story(self, mood: str, style: str = "Descriptive", length: Union[str, int] = "Medium",
+                   seed: Optional[int] = None, engine: str = "classic") -> "StoryRecord":
+        """Pick the template and story elements, returning a compact recipe"""
+        if engine not in EXPANSION_ENGINES:
+            raise ValueError(f"unknown expansion engine {engine!r}")
+        if engine == "model" and self.backend is None:
+            raise ValueError("the model engine needs a model backend")
+        if seed is None:
+            seed = _seed_source.getrandbits(63)
+        character_index, setting_index, conflict_index, template_index = self._draw_recipe(
+            random.Random(seed), mood)
+
+        # Expand based on length; custom lengths are given as a word count
+        target_words = length if isinstance(length, int) else LENGTH_WORDS[length]
+
+        return StoryRecord(
+            mood=mood,
+            style=style,
+            target_words=target_words,
+            template_index=template_index,
+            character_index=character_index,
+            setting_index=setting_index,
+            conflict_index=conflict_index,
+            seed=seed,
+            created_at=time.time(),
+            engine=engine
+        )
+
+    def _draw_recipe(self, rng: random.Random, mood: str) -> Tuple[int, int, int, int]:
+        """Draw character, setting, conflict and template indexes, in that order"""
+        return (rng.randrange(len(self.story_elements["characters"])),
+                rng.randrange(len(self.story_elements["settings"])),
+                rng.randrange(len(self.story_elements["conflicts"])),
+                rng.randrange(len(STORY_TEMPLATES[mood])))
+
+    def describe_story(self, record: "StoryRecord") -> Dict:
+        """Rebuild story metadata (everything but the text) from a recipe"""
+        conflict = self.story_elements["conflicts"][record.conflict_index]
+        return {
+            "title": f"The {record.mood} {conflict.replace(' ', ' ')}",
+            "mood": record.mood,
+            "character": self.story_elements["characters"][record.character_index],
+            "setting": self.story_elements["settings"][record.setting_index],
+            "conflict": conflict,
+            "style": record.style,
+            "length": record.target_words,
+            "emotional_arc": self._generate_emotional_arc(record.mood),
+            "seed": record.seed,
+            "recipe": record._asdict(),
+            "generated_at": datetime.fromtimestamp(record.created_at).strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+    def render_story_stream(self, record: "StoryRecord") -> Tuple[Dict, Iterator[str]]:
+        """Rebuild story metadata and a lazy text stream from a recipe"""
+        story_data = self.describe_story(record)
+        if record.text is not None:
+            return story_data, iter((record.text,))
+        chunks = self._text_stream(record, story_data)
+        if record.engine == "model":
+            chunks = self._keep_model_text(story_data, chunks)
+        return story_data, chunks
+
+    def _text_stream(self, record: "StoryRecord", story_data: Dict) -> Iterator[str]:
+        cached = self._cached_text(record)
+        if cached is not None:
+            return iter((cached,))
+        story_seed = self._story_seed(record, story_data)
+
+        # Stream the story text
+        if record.engine == "model":
+            chunks = self._model_expand_stream(self._expansion_request(record, story_seed))
+        elif record.engine == "ngram":
+            # numpy-backed, so only imported when a story asks for it
+            import ngram_engine
+            chunks = ngram_engine.expand_stream(story_seed, record.mood, record.target_words, record.seed)
+        else:
+            rng = random.Random(record.seed)
+            # The expansion continues the sequence the recipe was drawn from
+            self._draw_recipe(rng, record.mood)
+            chunks = self._expand_story_stream(story_seed, record.mood, record.style, record.target_words, rng)
+        if self.cache is not None:
+            chunks = self._cache_stream(record, chunks)
+        return chunks
+
+    def render_story(self, record: "StoryRecord") -> Dict:
+        """Rebuild the full story deterministically from a recipe"""
+        return self.render_stories([record])[0]
+
+    def render_stories(self, records: List["StoryRecord"]) -> List[Dict]:
+        """Rebuild several full stories, sending every model expansion they need in one backend call"""
+        stories = []
+        pending = []
+        for record in records:
+            if record.engine == "model" and record.text is None:
+                story_data = self.describe_story(record)
+                story = self._cached_text(record)
+                if story is None:
+                    pending.append((record, story_data, self._expansion_request(record, self._story_seed(
+                        record, story_data))))
+                else:
+                    self._set_text(story_data, story)
+            else:
+                story_data, chunks = self.render_story_stream(record)
+                with METRICS.timer("expansion"):
+                    self._set_text(story_data, "".join(chunks))
+            stories.append(story_data)
+
+        requests = [request for _, _, request in pending if request["max_words"]]
+        if requests:
+            backend = self._require_backend()
+            with METRICS.timer("expansion"):
+                # A lone request goes through complete(), which the backend merges across threads
+                completions = iter(backend.complete_batch(requests) if len(requests) > 1
+                                   else [backend.complete(requests[0])])
+        for record, story_data, request in pending:
+            story = request["prompt"] + (next(completions) if request["max_words"] else "")
+            if self.cache is not None:
+                self.cache.put(self._cache_key(record), {"story": story})
+            self._set_text(story_data, story)
+        return stories
+
+    @METRICS.timed("enhancement")
+    def enhance_story_stream(self, text: str) -> Iterator[str]:
+        """Stream a story enhanced by the model backend, or with the placeholder note without one"""
+        if self.backend is None:
+            yield text + ENHANCEMENT_NOTE
+            return
+        yield from self.backend.stream({"task": "enhance", "prompt": text})
+
+    @staticmethod
+    def _cache_key(record: "StoryRecord") -> str:
+        # Everything else in the recipe is drawn from the seed, and created_at does not affect the text
+        return request_key(mood=record.mood, style=record.style, length=record.target_words, seed=record.seed,
+                           engine=record.engine)
+
+    def _cached_text(self, record: "StoryRecord") -> Optional[str]:
+        if self.cache is None:
+            return None
+        cached = self.cache.get(self._cache_key(record))
+        if cached is None:
+            METRICS.incr("generation_cache_misses")
+            return None
+        METRICS.incr("generation_cache_hits")
+        return cached["story"]
+
+    @staticmethod
+    def _set_text(story_data: Dict, story: str):
+        story_data["story"] = story
+        story_data["length"] = len(story.split())
+        if story_data["recipe"]["engine"] == "model":
+            story_data["recipe"]["text"] = story
+
+    @staticmethod
+    def _keep_model_text(story_data: Dict, chunks: Iterator[str]) -> Iterator[str]:
+        # The finished text joins the recipe, so the library never asks the model again
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        story_data["recipe"]["text"] = "".join(parts)
+
+    def _cache_stream(self, record: "StoryRecord", chunks: Iterator[str]) -> Iterator[str]:
+        # Only a stream read to the end is cached
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        self.cache.put(self._cache_key(record), {"story": "".join(parts)})
+
+    @staticmethod
+    def _story_seed(record: "StoryRecord", story_data: Dict) -> str:
+        template = STORY_TEMPLATES[record.mood][record.template_index]
+        return template.format(character=story_data["character"], setting=story_data["setting"],
+                               element=story_data["conflict"])
+
+    @staticmethod
+    def _expansion_request(record: "StoryRecord", story_seed: str) -> Dict:
+        """Model request continuing the opening sentence up to the story's target length"""
+        seed_words = story_seed.split()[:record.target_words]
+        return {"task": "expand", "prompt": " ".join(seed_words), "mood": record.mood, "style": record.style,
+                "max_words": record.target_words - len(seed_words), "seed": record.seed}
+
+    def _model_expand_stream(self, request: Dict) -> Iterator[str]:
+        backend = self._require_backend()
+        yield request["prompt"]
+        if request["max_words"]:
+            yield from backend.stream(request)
+
+    def _require_backend(self):
+        if self.backend is None:
+            raise ValueError("this story was written by a model, but no model backend is configured")
+        return self.backend
+
+    def _expand_story(self, seed: str, mood: str, style: str, target_words: int,
+                      rng: random.Random = random) -> str:
+        """Expand story seed to target length"""
+        return "".join(self._expand_story_stream(seed, mood, style, target_words, rng))
+
+    def _expand_story_stream(self, seed: str, mood: str, style: str, target_words: int,
+                             rng: random.Random = random) -> Iterator[str]:
+        """Expand story seed to target length, yielding the text in chunks"""
+        # Built-in placeholder; the "model" engine hands expansion to a model backend instead
+        base_words = seed.split()
+        base_words.extend(EXPANSION_WORDS.get(mood, ()))
+        sample_size = min(10, len(base_words))
+
+        # Expand to target length, sampling from the fixed base so memory stays flat
+        chunk = base_words[:target_words]
+        separator = ""
+        remaining = target_words
+        while chunk:
+            yield separator + " ".join(chunk)
+            separator = " "
+            remaining -= len(chunk)
+            chunk = rng.sample(base_words, sample_size)[:remaining] if remaining > 0 else []
+
+    def writing_prompt(self, mood: str, rng: random.Random) -> str:
+        """Build a writing prompt from random story elements, drawn from the caller's RNG"""
+        return (f"Write a {mood.lower()} story about a {rng.choice(self.story_elements['characters'])} "
+                f"in {rng.choice(self.story_elements['settings'])} "
+                f"who discovers {rng.choice(self.story_elements['conflicts'])}.")
+
+    def _generate_emotional_arc(self, mood: str) -> List[Dict]:
+        """Generate emotional arc for the story"""
+        return [{"stage": stage, "intensity": intensity}
+                for stage, intensity in EMOTIONAL_ARCS.get(mood, EMOTIONAL_ARCS["Joyful"])]
+
+
+# Per-process generator used by bulk workers
+_worker_generator = None
+
+# Most jobs handed to a bulk worker at once, which is also the largest model batch it sends
+MAX_JOB_CHUNK = 64
+
+
+def _generate_jobs(jobs: List[Tuple[Dict, int]]) -> List[Dict]:
+    global _worker_generator
+    if _worker_generator is None:
+        from model_backend import backend_from_env
+        _worker_generator = MoodToStoryGenerator(cache=cache_from_env(), backend=backend_from_env())
+    # An explicit seed in the spec takes precedence over the derived one
+    stories = _worker_generator.generate_story_batch([{"seed": job_seed, **spec} for spec, job_seed in jobs])
+    for story in stories:
+        if isinstance(story, Exception):
+            raise story
+    return stories
+
+
+def generate_stories(specs: List[Dict], workers: Optional[int] = None, seed: Optional[int] = None) -> List[Dict]:
+    """Generate many stories in parallel, returned in the order of specs
+
+    Each spec holds generate_story keyword arguments (mood, user_input, style,
+    length). Every job gets its own seed drawn from one master seed, so the
+    output depends only on seed and specs, never on the number of workers.
+    """
+    return list(iter_generated_stories(specs, workers, seed, batch_size=max(1, len(specs))))
+
+
+def iter_generated_stories(specs: Iterable[Dict], workers: Optional[int] = None, seed: Optional[int] = None,
+                           batch_size: int = 1000) -> Iterator[Dict]:
+    """Generate stories for a stream of specs, yielding them in order
+
+    Specs are read batch_size at a time, so memory stays bounded for any
+    input. Job seeds continue one master sequence across batches and one
+    process pool serves them all, so the output matches generate_stories on
+    the whole input whatever the batch size.
+    """
+    master = random.Random(seed)
+    workers = workers or os.cpu_count() or 1
+    specs = iter(specs)
+    pool = None
+    try:
+        while True:
+            jobs = [(spec, master.getrandbits(64)) for spec in islice(specs, batch_size)]
+            if not jobs:
+                return
+            size = MAX_JOB_CHUNK if workers == 1 else max(1, min(MAX_JOB_CHUNK, len(jobs) // (workers * 4)))
+            chunks = [jobs[start:start + size] for start in range(0, len(jobs), size)]
+            if workers == 1 or len(chunks) <= 1:
+                for chunk in chunks:
+                    yield from _generate_jobs(chunk)
+                continue
+            if pool is None:
+                pool = ProcessPoolExecutor(max_workers=workers)
+            for stories in pool.map(_generate_jobs, chunks):
+                yield from stories
+    finally:
+        if pool is not None:
+            pool.shutdown()
@@ -0,0 +1,58 @@
+import os
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List
+
+from metrics import METRICS
+
+JOB_WORKERS = int(os.environ.get("STORY_JOB_WORKERS", 4))
+
+
+def job_pool(workers: int = JOB_WORKERS) -> ThreadPoolExecutor:
+    """Worker pool for story jobs, meant to be shared by every session of a process"""
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="story-job")
+
+
+class GenerationJob:
+    """A story rendered on a worker pool, readable while it is being written
+
+    The script thread that starts a job returns straight away; later reruns
+    read the partial text and pick up the finished story once done() is true.
+    """
+
+    def __init__(self, story_data: Dict, chunks: Iterator[str], executor: Executor):
+        self.story_data = story_data
+        self.saved = False
+        # Seconds from submission to the finished story, queueing included
+        self.seconds = None
+        self._started = time.perf_counter()
+        self._parts: List[str] = []
+        METRICS.incr("generation_jobs")
+        self._future = executor.submit(self._run, chunks)
+
+    def _run(self, chunks: Iterator[str]) -> Dict:
+        with METRICS.timer("story_job"):
+            for chunk in chunks:
+                self._parts.append(chunk)
+        story = "".join(self._parts)
+        self.story_data["story"] = story
+        self.story_data["length"] = len(story.split())
+        self.seconds = time.perf_counter() - self._started
+        return self.story_data
+
+    @property
+    def text(self) -> str:
+        """Text written so far"""
+        return "".join(self._parts)
+
+    def done(self) -> bool:
+        return self._future.done()
+
+    def wait(self, timeout: float) -> bool:
+        """Wait up to timeout seconds, returning whether the job has finished"""
+        wait([self._future], timeout)
+        return self._future.done()
+
+    def result(self) -> Dict:
+        """The finished story data; re-raises any error from the worker"""
+        return self._future.result()
@@ -0,0 +1,262 @@
+import asyncio
+import json
+from http import HTTPStatus
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from metrics import METRICS
+from story_generator import EXPANSION_ENGINES, LENGTH_WORDS, MoodToStoryGenerator
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+Handler = Callable[[Dict], Awaitable[Union[Dict, AsyncIterator[bytes]]]]
+
+
+class HTTPError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class UpstreamError(Exception):
+    """A service the handler depends on failed; answered with 502 Bad Gateway"""
+
+
+class MicroBatcher:
+    """Collects concurrent calls into batches for a list-in, list-out function
+
+    Calls arriving within max_wait seconds of each other (up to max_batch of
+    them) are run together in a worker thread, and each caller gets back its
+    own item of the result. An item that is an exception is raised to its
+    caller alone; an exception from batch_fn itself fails the whole batch.
+    Batches are counted as <metric>_batches and <metric>_batched_items.
+    """
+
+    def __init__(self, batch_fn: Callable[[List], List], max_batch: int = 64, max_wait: float = 0.005,
+                 metric: str = "service"):
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.metric = metric
+        self._pending: List[Tuple[object, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[object, asyncio.Future]]):
+        items = [item for item, _ in batch]
+        METRICS.incr(f"{self.metric}_batches")
+        METRICS.incr(f"{self.metric}_batched_items", len(items))
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(None, self.batch_fn, items)
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+    """Read one HTTP/1.1 request, or None when the client closed the connection"""
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    try:
+        method, path, _ = request_line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "malformed request line")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", 0) or 0)
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "invalid Content-Length")
+    if length < 0:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), path, headers, body
+
+
+def write_response(writer: asyncio.StreamWriter, status: HTTPStatus, payload, keep_alive: bool = True,
+                   content_type: str = "application/json"):
+    body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+    head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode("latin-1") + body)
+
+
+async def write_chunked_response(writer: asyncio.StreamWriter, status: HTTPStatus, chunks: AsyncIterator[bytes],
+                                 keep_alive: bool = True, content_type: str = "application/x-ndjson"):
+    """Send a response body with chunked transfer encoding as chunks arrive"""
+    head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Transfer-Encoding: chunked\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode("latin-1"))
+    async for chunk in chunks:
+        if chunk:
+            writer.write(f"{len(chunk):x}\r\n".encode("latin-1") + chunk + b"\r\n")
+            await writer.drain()
+    writer.write(b"0\r\n\r\n")
+
+
+class JSONService:
+    """Minimal keep-alive HTTP server routing JSON POST bodies to async handlers
+
+    A handler may return an async iterator of bytes instead of a dict, which
+    is streamed back with chunked transfer encoding.
+    """
+
+    def __init__(self, routes: Dict[str, Handler], max_concurrency: int = 64):
+        self.routes = routes
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HTTPError as error:
+                    write_response(writer, error.status, {"error": error.message}, keep_alive=False)
+                    break
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if request is None:
+                    break
+
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                status, payload = await self.dispatch(method, path, body)
+                if hasattr(payload, "__aiter__"):
+                    try:
+                        await write_chunked_response(writer, status, payload, keep_alive)
+                    except Exception:
+                        # The status line is already sent; dropping the connection marks the stream as failed
+                        break
+                else:
+                    write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def dispatch(self, method: str, path: str, body: bytes) -> Tuple[HTTPStatus, Dict]:
+        if method == "GET" and path == "/health":
+            return HTTPStatus.OK, {"status": "ok"}
+        handler = self.routes.get(path)
+        if handler is None:
+            return HTTPStatus.NOT_FOUND, {"error": f"unknown path {path}"}
+        if method != "POST":
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "use POST"}
+        try:
+            request = json.loads(body or b"{}")
+            if not isinstance(request, dict):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "request body must be a JSON object")
+            # Bound in-flight work so a burst queues here instead of exhausting threads
+            async with self._slots:
+                return HTTPStatus.OK, await handler(request)
+        except json.JSONDecodeError:
+            return HTTPStatus.BAD_REQUEST, {"error": "invalid JSON"}
+        except HTTPError as error:
+            return error.status, {"error": error.message}
+        except (KeyError, TypeError, ValueError) as error:
+            return HTTPStatus.BAD_REQUEST, {"error": str(error)}
+        except (UpstreamError, TimeoutError) as error:
+            METRICS.incr("service_upstream_errors")
+            return HTTPStatus.BAD_GATEWAY, {"error": str(error) or type(error).__name__}
+        except Exception as error:
+            # Answer instead of dropping the connection, which would also end the client's keep-alive
+            METRICS.incr("service_internal_errors")
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"internal error: {type(error).__name__}"}
+
+    async def serve(self, host: str, port: int):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def build_story_service(generator: Optional[MoodToStoryGenerator] = None, max_concurrency: int = 64,
+                        max_batch: int = 64, batch_wait: float = 0.005) -> JSONService:
+    """JSON service exposing /analyze and /generate for a generator"""
+    generator = generator or MoodToStoryGenerator()
+    analyze_batcher = MicroBatcher(generator.analyze_mood_batch, max_batch, batch_wait)
+    generate_batcher = MicroBatcher(generator.generate_story_batch, max_batch, batch_wait)
+
+    async def analyze(request: Dict) -> Dict:
+        text = request["text"]
+        if not isinstance(text, str):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "text must be a string")
+        return await analyze_batcher.submit(text)
+
+    async def generate(request: Dict) -> Dict:
+        spec = story_spec(request, generator)
+        return await generate_batcher.submit(spec)
+
+    return JSONService({"/analyze": analyze, "/generate": generate}, max_concurrency)
+
+
+def story_spec(request: Dict, generator: MoodToStoryGenerator) -> Dict:
+    """Validate a generation request into generate_story keyword arguments"""
+    mood = request["mood"]
+    if mood not in generator.moods:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"unknown mood {mood!r}")
+    style = request.get("style", "Descriptive")
+    if style not in generator.writing_styles:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"unknown style {style!r}")
+    user_input = request.get("user_input", "")
+    if not isinstance(user_input, str):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "user_input must be a string")
+    length = request.get("length", "Medium")
+    if isinstance(length, bool) or not (length in LENGTH_WORDS or (isinstance(length, int) and 0 < length <= 100000)):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"invalid length {length!r}")
+    seed = request.get("seed")
+    if seed is not None and (isinstance(seed, bool) or not isinstance(seed, int)):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"seed must be an integer, not {seed!r}")
+    engine = request.get("engine", "classic")
+    if engine not in EXPANSION_ENGINES:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"unknown engine {engine!r}")
+    if engine == "model" and generator.backend is None:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "no model backend is configured")
+    return {
+        "mood": mood,
+        "user_input": user_input,
+        "style": style,
+        "length": length,
+        "seed": seed,
+        "engine": engine
+    }
@@ -0,0 +1,298 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from story_generator import STORY_ELEMENTS, StoryRecord
+
+DEFAULT_DB_PATH = os.environ.get("STORY_DB_PATH", "stories.db")
+
+# Only the recipe is stored; story text and arcs are regenerated when displayed,
+# except model-written text, which the model could not write again
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS story_records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    mood TEXT NOT NULL,
+    style TEXT NOT NULL,
+    target_words INTEGER NOT NULL,
+    template_index INTEGER NOT NULL,
+    character_index INTEGER NOT NULL,
+    setting_index INTEGER NOT NULL,
+    conflict_index INTEGER NOT NULL,
+    seed INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    engine TEXT NOT NULL DEFAULT 'classic',
+    generation_seconds REAL,
+    owner TEXT NOT NULL DEFAULT '',
+    search_indexed INTEGER NOT NULL DEFAULT 0,
+    text TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_story_records_mood ON story_records (mood, created_at);
+CREATE INDEX IF NOT EXISTS idx_story_records_style ON story_records (style, created_at);
+CREATE INDEX IF NOT EXISTS idx_story_records_created_at ON story_records (created_at);
+CREATE INDEX IF NOT EXISTS idx_story_records_owner ON story_records (owner, created_at);
+CREATE INDEX IF NOT EXISTS idx_story_records_unindexed ON story_records (id) WHERE search_indexed = 0;
+"""
+
+# Analysis history for the analytics page; stories double as the generation history
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mood_analyses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    dominant_mood TEXT NOT NULL,
+    intensity REAL NOT NULL,
+    word_count INTEGER NOT NULL,
+    seconds REAL
+);
+"""
+
+# Story columns read by the analytics page, in order
+STORY_HISTORY_COLUMNS = ("id", "created_at", "mood", "style", "target_words", "character_index",
+                         "setting_index", "engine", "generation_seconds")
+ANALYSIS_HISTORY_COLUMNS = ("id", "created_at", "dominant_mood", "intensity", "word_count", "seconds")
+
+# Inverted index over story text and metadata. It is contentless (rowid = story id),
+# so it holds only the posting lists, not a second copy of every story
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS story_search USING fts5(
+    text, character, setting, conflict, mood, style, content=''
+);
+CREATE INDEX IF NOT EXISTS idx_story_records_character ON story_records (character_index);
+CREATE INDEX IF NOT EXISTS idx_story_records_setting ON story_records (setting_index);
+CREATE INDEX IF NOT EXISTS idx_story_records_conflict ON story_records (conflict_index);
+"""
+
+# Running story counts per owner and facet value, kept by add(), so an unfiltered library's
+# facets are read from a few dozen rows instead of grouping every story
+FACET_SCHEMA = """
+CREATE TABLE IF NOT EXISTS story_facet_counts (
+    owner TEXT NOT NULL,
+    facet TEXT NOT NULL,
+    value NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (owner, facet, value)
+) WITHOUT ROWID;
+"""
+
+# Facet name -> (story_records column, element list for index columns)
+FACETS = {
+    "mood": ("mood", None),
+    "style": ("style", None),
+    "character": ("character_index", STORY_ELEMENTS["characters"]),
+    "setting": ("setting_index", STORY_ELEMENTS["settings"]),
+    "conflict": ("conflict_index", STORY_ELEMENTS["conflicts"])
+}
+
+# Filtered facet counts group one owner's matching stories. Each (owner, filter column) index
+# carries the other facet columns too, so the count never touches story_records itself
+FACET_INDEXES = "".join(
+    f"CREATE INDEX IF NOT EXISTS idx_story_records_owner_{facet} ON story_records"
+    f" (owner, {', '.join([column] + [other for other, _ in FACETS.values() if other != column])});\n"
+    for facet, (column, _) in FACETS.items()
+)
+
+_TERM_RE = re.compile(r"\w+")
+
+
+def match_expression(query: str) -> str:
+    """FTS5 expression requiring every word of a free-text query, the last one as a prefix"""
+    terms = [f'"{term}"' for term in _TERM_RE.findall(query.lower())]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+RECORD_COLUMNS = ", ".join(StoryRecord._fields)
+
+
+class StoryStore:
+    """SQLite-backed story library of compact, paginated story records
+
+    Every story belongs to one owner's library. Listing, search and counts
+    take an owner to stay inside that library; leaving it out spans them all.
+    """
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.executescript(SEARCH_SCHEMA)
+            self._conn.executescript(FACET_SCHEMA)
+            self._conn.executescript(FACET_INDEXES)
+            self._conn.executescript(HISTORY_SCHEMA)
+
+    def add(self, record: StoryRecord, text: Optional[str] = None, seconds: Optional[float] = None,
+            owner: str = "") -> int:
+        """Persist a story recipe to owner's library with how long it took to write and return its id
+
+        The story is indexed for search with text; without it, it waits for index_missing().
+        """
+        placeholders = ", ".join("?" for _ in StoryRecord._fields)
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                f"INSERT INTO story_records ({RECORD_COLUMNS}, generation_seconds, owner, search_indexed)"
+                f" VALUES ({placeholders}, ?, ?, ?)",
+                (*record, seconds, owner, int(text is not None))
+            )
+            if text is not None:
+                self._index(cursor.lastrowid, record, text)
+            self._conn.executemany(
+                "INSERT INTO story_facet_counts (owner, facet, value, count) VALUES (?, ?, ?, 1)"
+                " ON CONFLICT (owner, facet, value) DO UPDATE SET count = count + 1",
+                [(owner, facet, getattr(record, column)) for facet, (column, _) in FACETS.items()]
+            )
+        return cursor.lastrowid
+
+    def index_missing(self, render: Callable[[StoryRecord], str], batch_size: int = 500) -> int:
+        """Index stories saved without their text, rendering it with render
+
+        Stories still to index are flagged in story_records, so stories saved
+        with text in the meantime never hide older ones. Returns the number of
+        stories indexed.
+        """
+        indexed = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT id, {RECORD_COLUMNS} FROM story_records WHERE search_indexed = 0 ORDER BY id LIMIT ?",
+                    (batch_size,)
+                ).fetchall()
+            if not rows:
+                return indexed
+            batch = [(row[0], StoryRecord(*row[1:])) for row in rows]
+            texts = [render(record) for _, record in batch]
+            with self._lock, self._conn:
+                for (story_id, record), text in zip(batch, texts):
+                    # Another session may have indexed the story while this one rendered it
+                    claimed = self._conn.execute("UPDATE story_records SET search_indexed = 1"
+                                                 " WHERE id = ? AND search_indexed = 0", (story_id,)).rowcount
+                    if claimed:
+                        self._index(story_id, record, text)
+                        indexed += 1
+
+    def add_analysis(self, analysis: Dict, seconds: Optional[float] = None) -> int:
+        """Record a mood analysis result for the analytics page"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO mood_analyses (created_at, dominant_mood, intensity, word_count, seconds)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (time.time(), analysis["dominant_mood"], analysis["intensity"], analysis["word_count"], seconds)
+            )
+        return cursor.lastrowid
+
+    def story_history(self, after_id: int = 0) -> List[Tuple]:
+        """STORY_HISTORY_COLUMNS rows of every story with an id above after_id, oldest first"""
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT {', '.join(STORY_HISTORY_COLUMNS)} FROM story_records WHERE id > ? ORDER BY id", (after_id,)
+            ).fetchall()
+
+    def analysis_history(self, after_id: int = 0) -> List[Tuple]:
+        """ANALYSIS_HISTORY_COLUMNS rows of every analysis with an id above after_id, oldest first"""
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT {', '.join(ANALYSIS_HISTORY_COLUMNS)} FROM mood_analyses WHERE id > ? ORDER BY id",
+                (after_id,)
+            ).fetchall()
+
+    def count(self, query: Optional[str] = None, *, owner: Optional[str] = None, **facets: Optional[str]) -> int:
+        """Count stories matching the optional search query and facet filters"""
+        where, params = self._filters(query, facets, owner)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM story_records{where}", params).fetchone()[0]
+
+    def list_page(self, page: int = 0, page_size: int = 20, query: Optional[str] = None, *,
+                  owner: Optional[str] = None, **facets: Optional[str]) -> List[Tuple[int, StoryRecord]]:
+        """List one page of matching (id, record) pairs, newest first"""
+        where, params = self._filters(query, facets, owner)
+        sql = (f"SELECT id, {RECORD_COLUMNS} FROM story_records{where}"
+               " ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?")
+        with self._lock:
+            rows = self._conn.execute(sql, params + [page_size, page * page_size]).fetchall()
+        return [(row[0], StoryRecord(*row[1:])) for row in rows]
+
+    def iter_records(self, query: Optional[str] = None, batch_size: int = 500, *, owner: Optional[str] = None,
+                     **facets: Optional[str]) -> Iterator[Tuple[int, StoryRecord]]:
+        """Yield every matching (id, record) pair, newest first, one batch at a time"""
+        page = 0
+        while True:
+            batch = self.list_page(page, batch_size, query, owner=owner, **facets)
+            yield from batch
+            if len(batch) < batch_size:
+                return
+            page += 1
+
+    def get(self, story_id: int) -> Optional[StoryRecord]:
+        """Load one story recipe by id"""
+        with self._lock:
+            row = self._conn.execute(f"SELECT {RECORD_COLUMNS} FROM story_records WHERE id = ?",
+                                     (story_id,)).fetchone()
+        return StoryRecord(*row) if row is not None else None
+
+    def facet_counts(self, query: Optional[str] = None, *, owner: Optional[str] = None,
+                     **facets: Optional[str]) -> Dict[str, Dict[str, int]]:
+        """Story counts per value of every facet
+
+        Each facet is counted under the search query and the other facets'
+        filters, so its counts show what picking a different value would leave.
+        A facet with no query or other filter to apply is read from the running
+        counts that add() keeps.
+        """
+        counts = {}
+        with self._lock:
+            for facet, (column, values) in FACETS.items():
+                others = {key: value for key, value in facets.items() if key != facet and value}
+                if not others and not match_expression(query or ""):
+                    where, params = " WHERE facet = ?", [facet]
+                    if owner is not None:
+                        where += " AND owner = ?"
+                        params.append(owner)
+                    rows = self._conn.execute(
+                        f"SELECT value, SUM(count) FROM story_facet_counts{where} GROUP BY value", params
+                    ).fetchall()
+                else:
+                    where, params = self._filters(query, others, owner)
+                    rows = self._conn.execute(
+                        f"SELECT {column}, COUNT(*) FROM story_records{where} GROUP BY {column}", params
+                    ).fetchall()
+                counts[facet] = {(values[key] if values is not None else key): count for key, count in rows}
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _index(self, story_id: int, record: StoryRecord, text: str):
+        # Callers hold the lock and the transaction
+        self._conn.execute(
+            "INSERT INTO story_search (rowid, text, character, setting, conflict, mood, style)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (story_id, text, STORY_ELEMENTS["characters"][record.character_index],
+             STORY_ELEMENTS["settings"][record.setting_index],
+             STORY_ELEMENTS["conflicts"][record.conflict_index], record.mood, record.style)
+        )
+
+    @staticmethod
+    def _filters(query: Optional[str], facets: Dict[str, Optional[str]], owner: Optional[str] = None):
+        clauses, params = [], []
+        if owner is not None:
+            clauses.append("owner = ?")
+            params.append(owner)
+        for facet, value in facets.items():
+            if not value:
+                continue
+            column, values = FACETS[facet]
+            clauses.append(f"{column} = ?")
+            # Element facets are stored as list indices; an unknown name matches nothing
+            params.append(value if values is None else (values.index(value) if value in values else -1))
+        expression = match_expression(query or "")
+        if expression:
+            # The posting-list lookup narrows the ids before story_records is touched
+            clauses.append("id IN (SELECT rowid FROM story_search WHERE story_search MATCH ?)")
+            params.append(expression)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
@@ -0,0 +1,14 @@
+from analytics import LibraryAnalytics
+from story_store import StoryStore
+
+
+def test_analysis_summary_keeps_half_step_intensity(tmp_path):
+    store = StoryStore(str(tmp_path / "stories.db"))
+    for intensity in (1.5, 1.5, 2.5):
+        store.add_analysis({"dominant_mood": "Joyful", "intensity": intensity, "word_count": 10})
+    analytics = LibraryAnalytics(store)
+    analytics.refresh()
+
+    summary = analytics.analysis_summary()
+    assert summary["count"] == 3
+    assert round(summary["mean_intensity"]["Joyful"], 2) == 1.83
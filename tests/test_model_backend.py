@@ -0,0 +1,89 @@
+import threading
+
+import pytest
+
+from metrics import METRICS
+from model_backend import HTTPModelBackend, ModelBackend, ModelBackendError
+from model_stub import start_stub_server
+from story_generator import MoodToStoryGenerator, StoryRecord
+from story_store import StoryStore
+
+
+def expand_request(seed):
+    return {"task": "expand", "prompt": "The night was dark.", "mood": "Horror", "style": "Descriptive",
+            "max_words": 20, "seed": seed}
+
+
+@pytest.fixture
+def counters():
+    METRICS.reset()
+    return lambda name: METRICS.snapshot()["counters"].get(name, 0)
+
+
+def test_backends_must_implement_complete_batch():
+    with pytest.raises(TypeError):
+        ModelBackend()
+
+
+def test_concurrent_complete_calls_are_merged(counters):
+    backend = HTTPModelBackend(start_stub_server(), batch_wait=0.05)
+    requests = [expand_request(seed) for seed in range(8)]
+    expected = backend.complete_batch(requests)
+
+    results = [None] * len(requests)
+
+    def call(index):
+        results[index] = backend.complete(requests[index])
+
+    threads = [threading.Thread(target=call, args=(index,)) for index in range(len(requests))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    backend.close()
+
+    assert results == expected
+    assert counters("model_merged_batched_items") == len(requests)
+    assert counters("model_merged_batches") < len(requests)
+    assert counters("model_batches") == 1 + counters("model_merged_batches")
+
+
+def test_complete_retries_unavailable_model(counters):
+    backend = HTTPModelBackend(start_stub_server(fail_first=1), backoff=0)
+    assert backend.complete_batch([expand_request(1)])[0]
+    assert counters("model_retries") == 1
+
+    failing = HTTPModelBackend(start_stub_server(fail_first=5), retries=1, backoff=0)
+    with pytest.raises(ModelBackendError, match="503"):
+        failing.complete_batch([expand_request(1)])
+
+
+def test_stream_retries_only_before_first_token(counters):
+    backend = HTTPModelBackend(start_stub_server(fail_first=1), backoff=0)
+    assert "".join(backend.stream(expand_request(2))) == backend.complete_batch([expand_request(2)])[0]
+    assert counters("model_retries") == 1
+
+    METRICS.reset()
+    broken = HTTPModelBackend(start_stub_server(break_after_tokens=3), backoff=0)
+    tokens = []
+    with pytest.raises(ModelBackendError, match="broke off"):
+        for token in broken.stream(expand_request(2)):
+            tokens.append(token)
+    assert len(tokens) == 3
+    assert counters("model_retries") == 0
+    assert counters("model_streams") == 1
+
+
+def test_model_stories_keep_their_text(tmp_path):
+    generator = MoodToStoryGenerator(backend=HTTPModelBackend(start_stub_server()))
+    story = generator.generate_story("Horror", seed=3, length="Short", engine="model")
+    assert story["recipe"]["text"] == story["story"]
+
+    story_data, chunks = generator.generate_story_stream("Joyful", seed=4, length="Short", engine="model")
+    text = "".join(chunks)
+    assert story_data["recipe"]["text"] == text
+
+    store = StoryStore(str(tmp_path / "stories.db"))
+    story_id = store.add(StoryRecord(**story["recipe"]), story["story"])
+    # A saved model story renders without asking the model again
+    assert MoodToStoryGenerator().render_story(store.get(story_id))["story"] == story["story"]
@@ -0,0 +1,55 @@
+from mood_scorer import DEFAULT_SCORER, MoodScorer, document_mood, mood_timeline, split_sections
+from story_generator import MoodToStoryGenerator
+
+TEXTS = [
+    "I feel so happy and excited today, but the dark night outside is a little scary.",
+    "A very strange, hidden secret from my childhood memory.",
+    "Nothing here matches at all.",
+    "",
+    "Magical magic and a brave journey; absolutely wonderful, really amazing!",
+]
+
+
+def test_words_only_match_whole_words():
+    result = DEFAULT_SCORER.score("She also wore a bold coat.")
+    # Neither "so" inside "also" nor "old" inside "bold" counts
+    assert result["intensity"] == 1
+    assert result["mood_scores"]["Nostalgic"] == 0
+    assert DEFAULT_SCORER.pattern.findall("also bold") == []
+
+
+def test_longest_keyword_wins():
+    scorer = MoodScorer({"Short": ["magic"], "Long": ["magical"]})
+    result = scorer.score("A magical evening")
+    assert result["mood_scores"] == {"Short": 0, "Long": 2}
+    assert result["dominant_mood"] == "Long"
+
+
+def test_score_batch_matches_score():
+    assert DEFAULT_SCORER.score_batch(TEXTS) == [DEFAULT_SCORER.score(text) for text in TEXTS]
+    assert DEFAULT_SCORER.score_batch([]) == []
+
+
+def test_analyze_mood_batch_matches_single_analysis():
+    generator = MoodToStoryGenerator()
+    assert generator.analyze_mood_batch(TEXTS) == [generator.analyze_mood_text(text) for text in TEXTS]
+
+
+def test_split_sections_on_chapter_headings():
+    plain = "Chapter 1\nIt was dark.\n\nCHAPTER TWO: Away\nWe left.\n"
+    markdown = "Intro.\n\n# Chapter 1\nIt was dark.\n\n## Part 2\nWe left.\n"
+    assert [label for label, _ in split_sections(plain)] == ["Chapter 1", "CHAPTER TWO: Away"]
+    assert [label for label, _ in split_sections(markdown)] == ["Opening", "Chapter 1", "Part 2"]
+    assert [label for label, _ in split_sections(plain.replace("\n", "\r\n"))] == ["Chapter 1", "CHAPTER TWO: Away"]
+
+
+def test_prose_never_splits_on_heading_words():
+    prose = "It began.\n\nPart of the plan was simple.\n\nBook 3 of the series came later.\n"
+    assert [label for label, _ in split_sections(prose)] == ["Words 1-15"]
+
+
+def test_document_mood_matches_whole_text_scoring():
+    text = "very happy and a wonderful day, then a dark scary night " * 1500
+    timeline = mood_timeline(text, 2000, workers=1)
+    assert len(timeline) > 1
+    assert document_mood(timeline) == DEFAULT_SCORER.score(text)
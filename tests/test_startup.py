@@ -0,0 +1,9 @@
+import os
+
+import check_startup
+
+
+def test_app_import_is_lazy_and_within_budget():
+    report = check_startup.measure(os.path.dirname(os.path.abspath(check_startup.__file__)))
+    assert report["loaded"] == []
+    assert report["elapsed_ms"] <= check_startup.BUDGET_MS
@@ -0,0 +1,46 @@
+from metrics import METRICS
+from story_cache import StoryCache, request_key
+from story_generator import MoodToStoryGenerator
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = StoryCache(max_entries=2)
+    cache.put("a", {"story": "A"})
+    cache.put("b", {"story": "B"})
+    assert cache.get("a") == {"story": "A"}
+    cache.put("c", {"story": "C"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"story": "A"}
+    assert cache.get("c") == {"story": "C"}
+    assert cache.stats()["entries"] == 2
+
+
+def test_disk_tier_survives_reopen_and_stays_bounded(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = StoryCache(max_entries=8, path=path, max_disk_entries=3)
+    for key in "abcd":
+        cache.put(key, {"story": key.upper()})
+
+    reopened = StoryCache(max_entries=8, path=path, max_disk_entries=3)
+    assert reopened.get("a") is None
+    assert reopened.get("d") == {"story": "D"}
+    assert reopened.stats()["disk_hits"] == 1
+    assert reopened._conn.execute("SELECT COUNT(*) FROM generation_cache").fetchone()[0] == 3
+
+
+def test_request_key_ignores_order_and_surrounding_space():
+    assert request_key(mood="Joyful ", seed=1) == request_key(seed=1, mood="Joyful")
+    assert request_key(mood="Joyful", seed=1) != request_key(mood="Joyful", seed=2)
+
+
+def test_generation_counts_cache_hits_and_misses():
+    METRICS.reset()
+    generator = MoodToStoryGenerator(cache=StoryCache())
+    first = generator.generate_story("Horror", seed=5)
+    assert generator.generate_story("Horror", seed=5)["story"] == first["story"]
+
+    counters = METRICS.snapshot()["counters"]
+    assert counters["generation_cache_misses"] == 1
+    assert counters["generation_cache_hits"] == 1
+    assert 'events_total{event="generation_cache_misses"} 1' in METRICS.to_prometheus()
@@ -0,0 +1,97 @@
+import asyncio
+import json
+from http import HTTPStatus
+
+from model_backend import ModelBackendError
+from story_generator import MoodToStoryGenerator, generate_stories, iter_generated_stories
+from story_service import build_story_service
+
+SPECS = [{"mood": "Romantic"}, {"mood": "Nostalgic", "length": "Short"}, {"mood": "Horror"}] * 3
+
+
+def dispatch(service, request):
+    return asyncio.run(service.dispatch("POST", "/generate", json.dumps(request).encode()))
+
+
+def test_generate_rejects_invalid_fields():
+    service = build_story_service()
+    for request in ({"mood": "Joyful", "style": 123}, {"mood": "Joyful", "style": "Shouty"},
+                    {"mood": "Joyful", "user_input": 5}, {"mood": "Joyful", "seed": "7"},
+                    {"mood": "Joyful", "seed": True}, {"mood": "Joyful", "length": True}):
+        status, payload = dispatch(service, request)
+        assert status == HTTPStatus.BAD_REQUEST, request
+        assert "error" in payload
+
+
+def test_one_bad_request_does_not_fail_its_batch():
+    service = build_story_service()
+
+    async def run():
+        return await asyncio.gather(*(service.dispatch("POST", "/generate", json.dumps(request).encode())
+                                      for request in ({"mood": "Joyful", "seed": 1}, {"mood": "Joyful", "seed": "x"},
+                                                      {"mood": "Horror", "seed": 2})))
+
+    statuses = [status for status, _ in asyncio.run(run())]
+    assert statuses == [HTTPStatus.OK, HTTPStatus.BAD_REQUEST, HTTPStatus.OK]
+
+
+def test_invalid_content_length_gets_400():
+    service = build_story_service()
+
+    async def run(content_length):
+        server = await asyncio.start_server(service.handle_connection, "127.0.0.1", 0)
+        async with server:
+            reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+            writer.write(f"POST /generate HTTP/1.1\r\nContent-Length: {content_length}\r\n\r\n".encode())
+            await writer.drain()
+            status_line = await reader.readline()
+            writer.close()
+            return status_line
+
+    for content_length in ("abc", "-5"):
+        assert asyncio.run(run(content_length)).startswith(b"HTTP/1.1 400")
+
+
+def test_batch_size_never_changes_seeded_stories():
+    whole = [story["story"] for story in generate_stories(SPECS, workers=1, seed=11)]
+    for batch_size in (1, 2, 4):
+        stories = iter_generated_stories(iter(SPECS), workers=1, seed=11, batch_size=batch_size)
+        assert [story["story"] for story in stories] == whole
+
+
+def test_backend_failures_are_answered_without_dropping_the_connection():
+    class FailingGenerator(MoodToStoryGenerator):
+        def generate_story_batch(self, specs):
+            return [ModelBackendError("model request failed"), TimeoutError(), RuntimeError("bug")][:len(specs)]
+
+    service = build_story_service(FailingGenerator(), max_batch=1)
+
+    async def run():
+        server = await asyncio.start_server(service.handle_connection, "127.0.0.1", 0)
+        async with server:
+            reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+            statuses = []
+            for _ in range(2):
+                body = json.dumps({"mood": "Joyful"}).encode()
+                writer.write(b"POST /generate HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % len(body) + body)
+                await writer.drain()
+                statuses.append(await reader.readline())
+                while await reader.readline() not in (b"\r\n", b""):
+                    pass
+                await reader.readuntil(b"}")
+            writer.close()
+            await writer.wait_closed()
+            return statuses
+
+    assert [status.split()[1] for status in asyncio.run(run())] == [b"502", b"502"]
+    assert dispatch(service, {"mood": "Joyful"})[0] == HTTPStatus.BAD_GATEWAY
+
+
+def test_unexpected_errors_are_answered_with_500():
+    class BrokenGenerator(MoodToStoryGenerator):
+        def generate_story_batch(self, specs):
+            return [RuntimeError("bug") for _ in specs]
+
+    status, payload = dispatch(build_story_service(BrokenGenerator()), {"mood": "Joyful"})
+    assert status == HTTPStatus.INTERNAL_SERVER_ERROR
+    assert payload == {"error": "internal error: RuntimeError"}
@@ -0,0 +1,65 @@
+from collections import Counter
+
+from story_generator import MoodToStoryGenerator
+from story_store import FACETS, StoryStore
+
+
+def render_text(generator):
+    return lambda record: generator.render_story(record)["story"]
+
+
+def test_index_missing_after_newer_story_saved_with_text(tmp_path):
+    generator = MoodToStoryGenerator()
+    store = StoryStore(str(tmp_path / "stories.db"))
+    # "The shadows in {setting} whispered..."
+    for seed in range(3):
+        store.add(generator.plan_story("Horror", seed=seed)._replace(template_index=0), owner="reader")
+    # A newer story arrives with its text before anyone opens the library
+    new = generator.plan_story("Joyful", seed=99)
+    store.add(new, generator.render_story(new)["story"], owner="reader")
+
+    assert store.index_missing(render_text(generator)) == 3
+    assert store.count("shadows") == 3
+    assert store.index_missing(render_text(generator)) == 0
+
+
+def test_index_missing_skips_stories_added_with_text(tmp_path):
+    generator = MoodToStoryGenerator()
+    store = StoryStore(str(tmp_path / "stories.db"))
+    for seed in range(4):
+        record = generator.plan_story("Mysterious", seed=seed)
+        store.add(record, generator.render_story(record)["story"], owner="reader")
+
+    assert store.index_missing(render_text(generator)) == 0
+    assert store.count("mysterious", owner="reader") == 4
+
+
+def grouped_facet_counts(store, owner, **facets):
+    # What facet_counts must return, counted straight from story_records
+    records = [record for _, record in store.iter_records(owner=owner)]
+    counts = {}
+    for facet, (column, values) in FACETS.items():
+        others = {key: value for key, value in facets.items() if key != facet and value}
+        matching = [record for record in records
+                    if all(getattr(record, FACETS[key][0]) == (value if FACETS[key][1] is None
+                                                               else FACETS[key][1].index(value))
+                           for key, value in others.items())]
+        counts[facet] = dict(Counter(getattr(record, column) if values is None else values[getattr(record, column)]
+                                     for record in matching))
+    return counts
+
+
+def test_facet_counts_match_grouped_stories(tmp_path):
+    generator = MoodToStoryGenerator()
+    store = StoryStore(str(tmp_path / "stories.db"))
+    moods = list(generator.moods)
+    for seed in range(60):
+        record = generator.plan_story(moods[seed % 3], generator.writing_styles[seed % 4], seed=seed)
+        store.add(record, "", owner="reader" if seed % 5 else "other")
+
+    assert store.facet_counts(owner="reader") == grouped_facet_counts(store, "reader")
+    assert store.facet_counts(owner="nobody") == {facet: {} for facet in FACETS}
+    for facets in ({"mood": moods[0]}, {"mood": moods[1], "style": generator.writing_styles[2]}):
+        assert store.facet_counts(owner="reader", **facets) == grouped_facet_counts(store, "reader", **facets)
+    everyone = store.facet_counts()
+    assert sum(everyone["mood"].values()) == 60
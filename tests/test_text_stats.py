@@ -0,0 +1,45 @@
+import io
+
+from text_stats import TextStatsCounter, iter_decoded_blocks, text_stats
+
+MANUSCRIPT = ("The rhythm of the sea was calm. Don't go!\n"
+              "She waited by the shore, 123 days in all.\n"
+              "\n"
+              "   \n"
+              "Morning came; the gulls cried over the café.\n"
+              "\n"
+              "Brrr. Nobody answered.\n")
+
+
+def syllables(text):
+    counter = TextStatsCounter()
+    counter.feed(text)
+    return counter.syllables
+
+
+def test_every_word_counts_at_least_one_syllable():
+    assert syllables("rhythm") == 1
+    assert syllables("123") == 1
+    assert syllables("don't") == 1
+    assert syllables("Brrr. Tsk, hmm") == 3
+    assert syllables("cake") == 1
+    assert syllables("the") == 1
+
+
+def test_paragraphs_are_separated_by_blank_lines():
+    assert text_stats(MANUSCRIPT)["paragraphs"] == 3
+    assert text_stats("one line\nand the next\n")["paragraphs"] == 1
+    assert text_stats("")["paragraphs"] == 0
+
+
+def test_crlf_input_counts_like_lf():
+    assert text_stats(MANUSCRIPT.replace("\n", "\r\n")) == text_stats(MANUSCRIPT)
+
+
+def test_chunked_file_counts_like_whole_text():
+    data = (MANUSCRIPT * 20).encode()
+    for chunk_bytes in (1, 7, 64, len(data)):
+        counter = TextStatsCounter()
+        for block in iter_decoded_blocks(io.BytesIO(data), chunk_bytes=chunk_bytes):
+            counter.feed(block)
+        assert counter.result() == text_stats(MANUSCRIPT * 20), chunk_bytes
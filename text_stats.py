@@ -0,0 +1,106 @@
+import codecs
+import hashlib
+import re
+from typing import BinaryIO, Dict, Iterable
+
+CHUNK_BYTES = 1024 * 1024
+
+_SENTENCE_RE = re.compile(r"[.!?]+")
+_VOWEL_GROUP_RE = re.compile(r"[aeiouy]+")
+# A trailing e after a consonant is silent only when an earlier vowel in the word carries the syllable
+_SILENT_E_RE = re.compile(r"[aeiouy][^\Waeiouy]*[^aeiouy\W]e\b")
+# Whole whitespace-delimited words, so "don't" is one word and "123" still counts
+_NO_VOWEL_WORD_RE = re.compile(r"(?<!\S)[^\saeiouy]+(?!\S)")
+_PARAGRAPH_START_RE = re.compile(r"\n(?:[ \t\r\f\v]*\n)+(?=[ \t\r\f\v]*\S)")
+
+
+class TextStatsCounter:
+    """Incremental word, sentence, paragraph and syllable counter
+
+    Text is fed in blocks of whole lines and every count is a regex scan of
+    the block, so a manuscript of any size is counted in one pass without
+    holding it in memory.
+    """
+
+    def __init__(self):
+        self.characters = 0
+        self.words = 0
+        self.sentences = 0
+        self.paragraphs = 0
+        self.syllables = 0
+        self._in_paragraph = False
+
+    def feed(self, block: str):
+        """Count a block of complete lines"""
+        if not block:
+            return
+        lowered = block.lower()
+        self.characters += len(block) - block.count("\n") - block.count("\r")
+        self.words += len(block.split())
+        self.sentences += len(_SENTENCE_RE.findall(block))
+        # Vowel groups approximate syllables; silent trailing e is dropped and every word counts at least one
+        self.syllables += (len(_VOWEL_GROUP_RE.findall(lowered)) - len(_SILENT_E_RE.findall(lowered))
+                           + len(_NO_VOWEL_WORD_RE.findall(lowered)))
+
+        # A paragraph starts at a non-blank line after a blank one; the prefix
+        # stands in for the previous block's last line
+        prefix = "x\n" if self._in_paragraph else "\n\n"
+        self.paragraphs += len(_PARAGRAPH_START_RE.findall(prefix + block))
+        last_line = block.rstrip("\n").rsplit("\n", 1)[-1] if not block.endswith("\n\n") else ""
+        self._in_paragraph = bool(last_line.strip())
+
+    def result(self) -> Dict:
+        """Counts plus Flesch readability scores"""
+        words = self.words
+        sentences = max(self.sentences, 1 if words else 0)
+        words_per_sentence = words / sentences if sentences else 0.0
+        syllables_per_word = max(self.syllables, words) / words if words else 0.0
+        return {
+            "words": words,
+            "sentences": self.sentences,
+            "paragraphs": self.paragraphs,
+            "characters": self.characters,
+            "avg_words_per_sentence": round(words_per_sentence, 2),
+            "flesch_reading_ease": round(206.835 - 1.015 * words_per_sentence - 84.6 * syllables_per_word, 1)
+            if words else 0.0,
+            "flesch_kincaid_grade": round(0.39 * words_per_sentence + 11.8 * syllables_per_word - 15.59, 1)
+            if words else 0.0,
+            "reading_minutes": round(words / 238, 1)
+        }
+
+
+def content_digest(data: bytes) -> str:
+    """Content hash used as the statistics cache key"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def text_stats(text: str) -> Dict:
+    """Statistics for an in-memory string"""
+    counter = TextStatsCounter()
+    counter.feed(text)
+    return counter.result()
+
+
+def iter_decoded_blocks(stream: BinaryIO, encoding: str = "utf-8", chunk_bytes: int = CHUNK_BYTES) -> Iterable[str]:
+    """Decode a binary stream in fixed-size chunks and yield blocks of whole lines"""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    pending = ""
+    while True:
+        chunk = stream.read(chunk_bytes)
+        pending += decoder.decode(chunk, final=not chunk)
+        if not chunk:
+            break
+        cut = pending.rfind("\n") + 1
+        if cut:
+            yield pending[:cut]
+            pending = pending[cut:]
+    if pending:
+        yield pending
+
+
+def file_stats(stream: BinaryIO, encoding: str = "utf-8") -> Dict:
+    """Statistics for a binary file-like object, read in chunks"""
+    counter = TextStatsCounter()
+    for block in iter_decoded_blocks(stream, encoding):
+        counter.feed(block)
+    return counter.result()